@@ -0,0 +1,334 @@
+"""
+Offline load test for bot.py. Imports the bot without connecting, swaps in a fake Discord client
+and a local Riot stand-in, runs the scenarios and writes the results as JSON.
+
+    python bench/bench_clash.py
+    python bench/bench_clash.py --guilds 5000 --clicks 10000 --compare bench_results.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+WORK_DIR = tempfile.mkdtemp(prefix="clash-bench-")
+
+# bot.py reads its configuration at import time.
+os.environ.setdefault('DATA_FILE', os.path.join(WORK_DIR, 'clash_state.json'))
+os.environ.setdefault('SQLITE_FILE', os.path.join(WORK_DIR, 'clash_state.db'))
+os.environ.setdefault('RIOT_REGIONS', 'na1')
+os.environ.setdefault('RIOT_API_KEY', 'bench')
+
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+import bot as clash  # noqa: E402
+from fakes import FakeDiscordClient, FakeInteraction, FakeRiotServer, FakeUser, synthetic_tournaments  # noqa: E402
+
+ROLES = ["Top", "Jungle", "Mid", "Bot", "Support", "Fill"]
+
+
+# --- MEASUREMENT ---
+class Measure:
+    """Wall time and peak traced memory of a block."""
+    def __enter__(self):
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self.started
+        self.peak_mb = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+
+def latency_stats(latencies):
+    return {
+        'p50_ms': clash.percentile(latencies, 50) * 1000,
+        'p90_ms': clash.percentile(latencies, 90) * 1000,
+        'p99_ms': clash.percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies, default=0) * 1000,
+    }
+
+def reset_bot(guilds, latency):
+    """Points bot.py at a fresh fake client and empty state."""
+    client = FakeDiscordClient(guilds, latency)
+    clash.bot = client
+    clash.ADMIN_USER_ID = client.admin.id
+    clash.CLASH_STATE = clash.empty_state()
+    clash.ROSTERS.reset()
+    clash.RESOLVED_CHANNELS.clear()
+    clash.SCHEDULE_CACHE.clear()
+    clash.SCHEDULE_FINGERPRINTS.clear()
+    clash.OUTBOX_GUILDS.clear()
+    clash.OUTBOX_INFLIGHT.clear()
+    return client
+
+def sample_event(region='na1'):
+    now = clash.now_ms()
+    days = []
+    for tournament in synthetic_tournaments(now, tournament_count=1):
+        for day in tournament['schedule']:
+            day = dict(day, tournament_id=tournament['id'], region=region,
+                       name=tournament['nameKey'].replace('_', ' ').title(),
+                       secondary_name=tournament['nameKeySecondary'].replace('_', ' ').title())
+            days.append(day)
+    related_ids = sorted(str(d['tournament_id']) for d in days)
+    return clash.make_event_id(region, related_ids), clash.build_announcement_embed(days), related_ids
+
+def synthetic_state(guilds, signups):
+    state = clash.empty_state()
+    for g in range(guilds):
+        guild_id = str(10 ** 17 + g)
+        record = clash.GuildRecord(channel_id=10 ** 18 + g, message_id=10 ** 18 + 10 ** 6 + g,
+                                   tournament_id='na1:5000_6000', region='na1')
+        record.saturday = {10 ** 17 + u: clash.roles_to_mask(random.sample(ROLES, 2)) for u in range(signups)}
+        record.sunday = {10 ** 17 + u: clash.roles_to_mask([random.choice(ROLES)]) for u in range(signups // 2)}
+        state['guilds'][guild_id] = record
+    state['approved_ids']['na1:5000_6000'] = int(clash.now_ms())
+    return state
+
+async def drain_background():
+    """Waits for coalesced embed edits and the write-behind flush to settle."""
+    while clash.EMBED_EDITS.tasks:
+        await asyncio.gather(*list(clash.EMBED_EDITS.tasks.values()), return_exceptions=True)
+    await clash.STATE_WRITER.flush()
+
+
+# --- SCENARIOS ---
+async def scenario_broadcast(args):
+    client = reset_bot(args.guilds, args.discord_latency)
+    event_id, embed, related_ids = sample_event()
+
+    with Measure() as m:
+        report = await clash.broadcast_to_guilds(event_id, embed, related_ids)
+    with Measure() as again:
+        unchanged = await clash.broadcast_to_guilds(event_id, embed, related_ids)
+    await drain_background()
+
+    return {
+        'guilds': args.guilds,
+        'wall_s': m.wall,
+        'guilds_per_s': args.guilds / m.wall if m.wall else 0,
+        'outcomes': report.outcomes,
+        **latency_stats(report.latencies),
+        'api_calls': client.api_calls,
+        'peak_mb': m.peak_mb,
+        'unchanged_wall_s': again.wall,
+        'unchanged_outcomes': unchanged.outcomes,
+    }
+
+async def scenario_rsvp_burst(args):
+    client = reset_bot(args.rsvp_guilds, args.discord_latency)
+    event_id, embed, related_ids = sample_event()
+    await clash.broadcast_to_guilds(event_id, embed, related_ids)
+    await drain_background()
+
+    messages = []
+    for guild in client.guilds:
+        guild_data = clash.CLASH_STATE['guilds'][str(guild.id)]
+        channel = clash.resolve_announcement_channel(guild, guild_data)
+        messages.append((guild, channel.messages[guild_data.message_id]))
+
+    users = [FakeUser() for _ in range(max(1, args.clicks // 3))]
+    api_calls_before = client.api_calls
+    flushes_before = clash.STATE_WRITER.flushes
+    latencies = []
+
+    async def click(i):
+        guild, message = messages[i % len(messages)]
+        user = random.choice(users)
+        day = random.choice(["Saturday", "Sunday"])
+        parent = clash.RSVPView(guild.id)
+        view = clash.EphemeralRSVPView(day, parent, message)
+        interaction = FakeInteraction(user, guild, message)
+        started = time.perf_counter()
+        if random.random() < 0.1:
+            await view.remove_button.callback(interaction)
+        else:
+            select = next(c for c in view.children if isinstance(c, clash.RoleSelect))
+            select._values = random.sample(ROLES, random.randint(1, 3))
+            await select.callback(interaction)
+        latencies.append(interaction.responded_at - started)
+
+    with Measure() as m:
+        for start in range(0, args.clicks, args.click_batch):
+            await asyncio.gather(*(click(i) for i in range(start, min(args.clicks, start + args.click_batch))))
+    settle_started = time.perf_counter()
+    await drain_background()
+    settle = time.perf_counter() - settle_started
+
+    return {
+        'clicks': args.clicks,
+        'guilds': args.rsvp_guilds,
+        'wall_s': m.wall,
+        'clicks_per_s': args.clicks / m.wall if m.wall else 0,
+        **latency_stats(latencies),
+        'embed_edits': client.api_calls - api_calls_before,
+        'state_flushes': clash.STATE_WRITER.flushes - flushes_before,
+        'settle_s': settle,
+        'peak_mb': m.peak_mb,
+    }
+
+def run_cold_start(backend_name, args):
+    state = synthetic_state(args.state_guilds, args.state_signups)
+    directory = tempfile.mkdtemp(dir=WORK_DIR)
+    json_path = os.path.join(directory, 'state.json')
+    if backend_name == 'sqlite':
+        path = os.path.join(directory, 'state.db')
+        make = lambda: clash.SqliteStateBackend(path, json_path)
+    else:
+        path = json_path
+        make = lambda: clash.JsonStateBackend(path)
+
+    writer = make()
+    with Measure() as save:
+        writer.write(writer.snapshot(state))
+    with Measure() as load:
+        loaded = make().load()
+    assert len(loaded['guilds']) == args.state_guilds
+
+    if backend_name == 'sqlite':
+        # Fold the WAL into the main file so its size covers everything written.
+        writer.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    file_bytes = sum(os.path.getsize(p) for p in (path, path + '-wal') if os.path.exists(p))
+
+    return {
+        'backend': backend_name,
+        'guilds': args.state_guilds,
+        'signups_per_guild': args.state_signups,
+        'full_save_s': save.wall,
+        'load_s': load.wall,
+        'file_mb': file_bytes / 2 ** 20,
+        'save_peak_mb': save.peak_mb,
+        'load_peak_mb': load.peak_mb,
+    }
+
+async def scenario_clash_check(args):
+    server = FakeRiotServer(synthetic_tournaments(clash.now_ms()), args.riot_latency)
+    clash.RIOT_API_BASE = await server.start()
+    try:
+        client = reset_bot(args.guilds, args.discord_latency)
+
+        # First run detects the event and asks the admin; approve it like the button would.
+        await clash.core_clash_check()
+        for event_id, ends_at in list(clash.CLASH_STATE['pending_ids'].items()):
+            clash.CLASH_STATE['approved_ids'][event_id] = ends_at
+            del clash.CLASH_STATE['pending_ids'][event_id]
+
+        with Measure() as m:
+            await clash.core_clash_check()
+        # Unchanged schedule: short-circuits on the fingerprint.
+        with Measure() as again:
+            await clash.core_clash_check()
+        await drain_background()
+    finally:
+        await server.stop()
+
+    return {
+        'guilds': args.guilds,
+        'wall_s': m.wall,
+        'repeat_wall_s': again.wall,
+        'riot_requests': server.requests,
+        'api_calls': client.api_calls,
+        'peak_mb': m.peak_mb,
+    }
+
+
+# --- RUNNER ---
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, text=True).strip()
+    except Exception:
+        return None
+
+def compare(previous, current):
+    """Prints numeric metrics side by side with their relative change."""
+    for name, metrics in current['scenarios'].items():
+        old = previous.get('scenarios', {}).get(name)
+        if not old: continue
+        print(f"\n{name}")
+        for key, value in metrics.items():
+            before = old.get(key)
+            if isinstance(value, (int, float)) and isinstance(before, (int, float)) and not isinstance(value, bool):
+                change = f"{(value - before) / before * 100:+.1f}%" if before else "n/a"
+                print(f"  {key:<20} {before:>12.3f} -> {value:>12.3f}  ({change})")
+
+async def main(args):
+    random.seed(args.seed)
+    clash.EMBED_EDITS.window = args.edit_window
+    if not args.discord_rate:
+        clash.DISCORD_LIMITER = clash.RateLimiter([(10 ** 9, 1)])
+    else:
+        clash.DISCORD_LIMITER = clash.RateLimiter([(args.discord_rate, 1)])
+
+    scenarios = {}
+    selected = set(args.only or ['broadcast', 'rsvp_burst', 'cold_start', 'clash_check'])
+    if 'broadcast' in selected:
+        print(f"broadcast: {args.guilds} guilds...")
+        scenarios['broadcast'] = await scenario_broadcast(args)
+    if 'rsvp_burst' in selected:
+        print(f"rsvp_burst: {args.clicks} clicks over {args.rsvp_guilds} guilds...")
+        scenarios['rsvp_burst'] = await scenario_rsvp_burst(args)
+    if 'cold_start' in selected:
+        for backend_name in ('json', 'sqlite'):
+            print(f"cold_start ({backend_name}): {args.state_guilds} guilds x {args.state_signups} signups...")
+            scenarios[f'cold_start_{backend_name}'] = run_cold_start(backend_name, args)
+    if 'clash_check' in selected:
+        print(f"clash_check: {args.guilds} guilds...")
+        scenarios['clash_check'] = await scenario_clash_check(args)
+    await clash.RIOT_CLIENT.close()
+
+    return {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'args': vars(args),
+        },
+        'scenarios': scenarios,
+    }
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--guilds', type=int, default=5000, help="guilds for broadcast and clash_check")
+    parser.add_argument('--clicks', type=int, default=10000, help="RSVP interactions in the burst")
+    parser.add_argument('--rsvp-guilds', type=int, default=50, help="guilds the RSVP burst is spread over")
+    parser.add_argument('--click-batch', type=int, default=500, help="RSVP interactions in flight at once")
+    parser.add_argument('--state-guilds', type=int, default=5000, help="guilds in the cold-start state")
+    parser.add_argument('--state-signups', type=int, default=20, help="Saturday signups per cold-start guild")
+    parser.add_argument('--discord-latency', type=float, default=0.02, help="seconds per fake Discord API call")
+    parser.add_argument('--riot-latency', type=float, default=0.05, help="seconds per fake Riot API call")
+    parser.add_argument('--discord-rate', type=int, default=0, help="global Discord requests/s (0 = unlimited)")
+    parser.add_argument('--edit-window', type=float, default=0.25, help="EMBED_EDITS window in seconds")
+    parser.add_argument('--only', nargs='*', choices=['broadcast', 'rsvp_burst', 'cold_start', 'clash_check'])
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', default=os.path.join(REPO_DIR, 'bench_results.json'))
+    parser.add_argument('--compare', help="previous results file to diff against")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    previous = None
+    if args.compare:
+        # Read first: --compare may name the file this run is about to overwrite.
+        with open(args.compare) as f:
+            previous = json.load(f)
+    results = asyncio.run(main(args))
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results['scenarios'], indent=2))
+    print(f"Results written to {args.output}")
+    if previous:
+        compare(previous, results)
@@ -0,0 +1,192 @@
+"""
+Offline stand-ins for the benchmark: a fake Discord client with synthetic guilds, channels and
+messages, and a local HTTP server that answers like Riot's Clash endpoint.
+"""
+import asyncio
+import itertools
+import time
+
+from aiohttp import web
+
+# Discord snowflakes are large ints; keep synthetic ids in the same range.
+_ids = itertools.count(10 ** 17)
+
+def next_id():
+    return next(_ids)
+
+
+# --- DISCORD STAND-INS ---
+class FakePermissions:
+    send_messages = True
+
+class FakeUser:
+    def __init__(self, user_id=None, name="user"):
+        self.id = user_id or next_id()
+        self.name = name
+        self.sent = []
+
+    async def send(self, content=None, embed=None, view=None):
+        self.sent.append(content)
+
+class FakeMessage:
+    def __init__(self, channel, content=None, embed=None):
+        self.id = next_id()
+        self.channel = channel
+        self.content = content
+        self.embeds = [embed] if embed else []
+        self.edits = 0
+
+    async def edit(self, content=None, embed=None, view=None):
+        await self.channel.client.api_call()
+        if embed is not None:
+            # Mirror the real API round trip: the embed is serialized at send time.
+            self.embeds = [embed.copy()]
+        self.edits += 1
+        return self
+
+class FakeTextChannel:
+    def __init__(self, client, guild, name):
+        self.id = next_id()
+        self.client = client
+        self.guild = guild
+        self.name = name
+        self.messages = {}
+
+    def permissions_for(self, member):
+        return FakePermissions()
+
+    async def send(self, content=None, embed=None, view=None):
+        await self.client.api_call()
+        message = FakeMessage(self, content, embed.copy() if embed else None)
+        self.messages[message.id] = message
+        return message
+
+    async def fetch_message(self, message_id):
+        await self.client.api_call()
+        return self.messages[message_id]
+
+class FakeGuild:
+    def __init__(self, client, index, channel_count=5):
+        self.id = next_id()
+        self.name = f"guild-{index}"
+        self.me = FakeUser(client.user.id, "clash-bot")
+        self.text_channels = [FakeTextChannel(client, self, name)
+                              for name in ['random', 'memes', 'general', 'clash', 'off-topic'][:channel_count]]
+        self.system_channel = None
+        self._channels = {c.id: c for c in self.text_channels}
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def edit_message(self, content=None, view=None, embed=None):
+        self.interaction.responded_at = time.perf_counter()
+
+    async def send_message(self, content=None, view=None, ephemeral=False, embed=None):
+        self.interaction.responded_at = time.perf_counter()
+
+    async def defer(self, ephemeral=False):
+        pass
+
+class FakeInteraction:
+    def __init__(self, user, guild, message=None):
+        self.user = user
+        self.guild_id = guild.id
+        self.guild = guild
+        self.message = message
+        self.response = FakeResponse(self)
+        self.responded_at = None
+
+class FakeDiscordClient:
+    """Enough of commands.Bot for broadcast, RSVP and check code paths; API calls just sleep."""
+    def __init__(self, guild_count, latency=0.02):
+        self.latency = latency
+        self.api_calls = 0
+        self.user = FakeUser(name="clash-bot")
+        self.admin = FakeUser(name="admin")
+        self.guilds = [FakeGuild(self, i) for i in range(guild_count)]
+        self._guilds = {g.id: g for g in self.guilds}
+        self._channels = {c.id: c for g in self.guilds for c in g.text_channels}
+
+    async def api_call(self):
+        self.api_calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def get_guild(self, guild_id):
+        return self._guilds.get(int(guild_id))
+
+    def get_channel(self, channel_id):
+        return self._channels.get(int(channel_id))
+
+    async def fetch_user(self, user_id):
+        await self.api_call()
+        return self.admin
+
+    def is_closed(self):
+        return False
+
+    async def wait_until_ready(self):
+        pass
+
+
+# --- RIOT STAND-IN ---
+def synthetic_tournaments(now_ms, registration_in_days=2, tournament_count=2):
+    """Clash tournaments shaped like the Riot API response, one weekend of two days each."""
+    day_ms = 24 * 60 * 60 * 1000
+    tournaments = []
+    for t in range(tournament_count):
+        start = now_ms + (registration_in_days + 7 * t) * day_ms
+        tournaments.append({
+            'id': 5000 + t,
+            'themeId': 1,
+            'nameKey': f'bench_cup_{t}',
+            'nameKeySecondary': 'day_1',
+            'schedule': [
+                {'id': 9000 + 2 * t, 'registrationTime': start, 'startTime': start + 3 * 3600 * 1000, 'cancelled': False},
+            ],
+        })
+        tournaments.append({
+            'id': 6000 + t,
+            'themeId': 1,
+            'nameKey': f'bench_cup_{t}',
+            'nameKeySecondary': 'day_2',
+            'schedule': [
+                {'id': 9001 + 2 * t, 'registrationTime': start + day_ms, 'startTime': start + day_ms + 3 * 3600 * 1000, 'cancelled': False},
+            ],
+        })
+    return tournaments
+
+class FakeRiotServer:
+    """Serves /lol/clash/v1/tournaments on 127.0.0.1 with an optional artificial latency."""
+    def __init__(self, tournaments, latency=0.05):
+        self.tournaments = tournaments
+        self.latency = latency
+        self.requests = 0
+        self.runner = None
+        self.base_url = None
+
+    async def handle(self, request):
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return web.json_response(self.tournaments)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/lol/clash/v1/tournaments', self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        # One server stands in for every region.
+        self.base_url = f"http://127.0.0.1:{port}"
+        return self.base_url
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
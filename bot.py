@@ -1,120 +1,1441 @@
 import discord
-from discord.ext import commands, tasks
+from discord import app_commands
+from discord.ext import commands
 from discord.ui import Button, View, Select
-import requests
+import aiohttp
+import aiohttp.web
 import datetime
 import asyncio
+import functools
+import hashlib
+import heapq
+import inspect
 import os
 import json
+import math
+import random
+import signal
+import socket
+import sqlite3
+import tempfile
+import time
 
 # --- CONFIGURATION ---
 RIOT_API_KEY = os.getenv('RIOT_API_KEY')
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 # ANNOUNCEMENT_CHANNEL_ID is no longer hardcoded. Use /setclashchannel command.
-RIOT_REGION = os.getenv('RIOT_REGION', 'na1')
+RIOT_REGION = os.getenv('RIOT_REGION', 'na1').strip().lower()
+# Platform regions polled by this process (comma separated). RIOT_REGION is the default for guilds.
+RIOT_REGIONS = [r.strip().lower() for r in os.getenv('RIOT_REGIONS', RIOT_REGION).split(',') if r.strip()]
+if RIOT_REGION not in RIOT_REGIONS:
+    RIOT_REGIONS.insert(0, RIOT_REGION)
+# Override to point at a proxy or a local stand-in; {region} is filled in per request.
+RIOT_API_BASE = os.getenv('RIOT_API_BASE', 'https://{region}.api.riotgames.com')
+RIOT_TIMEOUT = float(os.getenv('RIOT_TIMEOUT', '10'))
+RIOT_MAX_RETRIES = int(os.getenv('RIOT_MAX_RETRIES', '4'))
+RIOT_POOL_SIZE = int(os.getenv('RIOT_POOL_SIZE', '10'))
+# Riot per-key limits as "requests:seconds" pairs. Defaults match a development key.
+RIOT_RATE_LIMITS = os.getenv('RIOT_RATE_LIMITS', '20:1,100:120')
+# Concurrent guilds per broadcast, and our own cap under Discord's global 50 requests/second.
+BROADCAST_WORKERS = int(os.getenv('BROADCAST_WORKERS', '8'))
+DISCORD_RATE_LIMITS = os.getenv('DISCORD_RATE_LIMITS', '45:1')
+# Minimum seconds between roster edits of the same announcement message.
+EMBED_EDIT_WINDOW = float(os.getenv('EMBED_EDIT_WINDOW', '2'))
 PING_ROLE = "@everyone"
-DATA_FILE = "clash_state.json"
+# Broadcast outbox: failed guild deliveries retry with exponential backoff (seconds) until
+# OUTBOX_MAX_ATTEMPTS; after that the guild is skipped for that event until its channel or roles
+# change. Before re-posting, the last OUTBOX_VERIFY_DEPTH channel messages are checked so an
+# announcement that did go out isn't posted (and pinged) twice.
+OUTBOX_RETRY_BASE = float(os.getenv('OUTBOX_RETRY_BASE', '30'))
+OUTBOX_RETRY_MAX = float(os.getenv('OUTBOX_RETRY_MAX', '3600'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_VERIFY_DEPTH = int(os.getenv('OUTBOX_VERIFY_DEPTH', '25'))
+# Lock-in reminders (opt-in per guild with /clashreminders): sent this many minutes before a day's
+# Tier IV lock-in opens. DMs get their own, stricter limiter on top of DISCORD_RATE_LIMITS.
+REMINDER_LEAD_MINUTES = float(os.getenv('REMINDER_LEAD_MINUTES', '30'))
+REMINDER_DM_RATE_LIMITS = os.getenv('REMINDER_DM_RATE_LIMITS', '5:1')
+DATA_FILE = os.getenv('DATA_FILE', 'clash_state.json')
+# Where state lived before DATA_FILE moved into a data directory; read once if DATA_FILE is missing.
+LEGACY_DATA_FILE = os.getenv('LEGACY_DATA_FILE', 'clash_state.json')
+# Write-behind: state is flushed SAVE_DELAY seconds after the first change,
+# or as soon as SAVE_MAX_PENDING changes have piled up.
+SAVE_DELAY = float(os.getenv('SAVE_DELAY', '2'))
+SAVE_MAX_PENDING = int(os.getenv('SAVE_MAX_PENDING', '100'))
+# "json" (single file) or "sqlite" (per-guild rows, only changed rows are written).
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'json').lower()
+# Defaults to sitting next to DATA_FILE (so it lands on the same volume).
+SQLITE_FILE = os.getenv('SQLITE_FILE', os.path.join(os.path.dirname(DATA_FILE), 'clash_state.db'))
+# Seen days and approved/pending events are forgotten this long after their tournament ends.
+EVENT_RETENTION_DAYS = float(os.getenv('EVENT_RETENTION_DAYS', '14'))
+# A Clash day runs a few hours after its startTime; used to stamp when an event is over.
+CLASH_DAY_LENGTH_MS = 6 * 60 * 60 * 1000
+# Announcements go out once registration is at most this far away.
+GUARD_WINDOW_MS = 10 * 24 * 60 * 60 * 1000
+# Adaptive polling (seconds): idle = no known tournament, watch = known but outside the guard
+# window, near = inside it, hot = within 48h of registration/start. Failed fetches retry sooner.
+POLL_IDLE_INTERVAL = float(os.getenv('POLL_IDLE_INTERVAL', str(3 * 24 * 3600)))
+POLL_WATCH_INTERVAL = float(os.getenv('POLL_WATCH_INTERVAL', str(24 * 3600)))
+POLL_NEAR_INTERVAL = float(os.getenv('POLL_NEAR_INTERVAL', str(6 * 3600)))
+POLL_HOT_INTERVAL = float(os.getenv('POLL_HOT_INTERVAL', str(3600)))
+POLL_RETRY_INTERVAL = float(os.getenv('POLL_RETRY_INTERVAL', str(15 * 60)))
+# Floor between polls; also the delay for the first poll after (re)start when one is due.
+POLL_MIN_INTERVAL = float(os.getenv('POLL_MIN_INTERVAL', '60'))
 ADMIN_USER_ID = 271789786883293195
+# Prometheus text endpoint at http://METRICS_HOST:METRICS_PORT/metrics. Disabled when unset.
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+LOOP_LAG_INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL', '1'))
+# Sharded mode: SHARD_COUNT shards in total, this process runs SHARD_IDS (default: all of them).
+# Every process must share one STATE_BACKEND=sqlite database; one of them is elected leader.
+# Single host only: SQLite's WAL mode needs shared memory between the processes, so the
+# database must be on a local disk they all see, never on NFS/SMB or another network share.
+SHARD_COUNT = int(os.getenv('SHARD_COUNT', '0'))
+SHARD_IDS = [int(i) for i in os.getenv('SHARD_IDS', '').split(',') if i.strip()] or list(range(SHARD_COUNT))
+SHARDED = SHARD_COUNT > 0
+SHARD_SYNC_INTERVAL = float(os.getenv('SHARD_SYNC_INTERVAL', '15'))
+LEADER_LEASE_SECONDS = float(os.getenv('LEADER_LEASE_SECONDS', '45'))
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}"
 
 # --- GLOBAL STATE ---
 # Structure: { 
-#   'guilds': { 'GUILD_ID': { ... } }, 
-#   'days': [ ... ],
-#   'approved_ids': [ ... ],
-#   'pending_ids': [ ... ]
+#   'guilds': { 'GUILD_ID': GuildRecord },
+#   'days': { 'REGION:DAY_ID': ends_at_ms, ... },
+#   'approved_ids': { 'REGION:EVENT_ID': ends_at_ms, ... },
+#   'pending_ids': { 'REGION:EVENT_ID': ends_at_ms, ... },
+#   'scheduler': { 'next_run': ms },
+#   'announcements': { 'REGION:EVENT_ID': { 'embed': {...}, 'related_ids': [...], 'lock_ins': [ms, ...], 'updated_at': ms } },
+#   'commands': { 'hash': sha256 of the last synced slash command definitions }
 # }
-CLASH_STATE = {'guilds': {}, 'days': [], 'approved_ids': [], 'pending_ids': []}
+# An event id is the region plus the sorted tournament ids of its days, e.g. "euw1:1234_1235".
+CLASH_STATE = {'guilds': {}, 'days': {}, 'approved_ids': {}, 'pending_ids': {}, 'scheduler': {}, 'announcements': {}, 'commands': {}}
 
 # --- SETUP ---
+class ClashBot(commands.AutoShardedBot if SHARDED else commands.Bot):
+    async def setup_hook(self):
+        # Runs once per process, unlike on_ready which fires again on every reconnect.
+        global CLASH_STATE
+        CLASH_STATE = load_state()
+        ROSTERS.reset()
+        resume_outbox()
+        rebuild_reminders()
+
+        # One persistent view serves every guild's RSVP message; clicks are routed at click time.
+        self.add_view(RSVPView())
+        # Approval buttons are routed by custom_id, so they work after restarts and on any shard.
+        self.add_dynamic_items(ApprovalButton)
+        await sync_commands_if_changed()
+
+        # `docker stop` sends SIGTERM to PID 1; close cleanly so pending state is flushed.
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.ensure_future(self.close()))
+        except (NotImplementedError, RuntimeError):
+            pass  # No signal handlers on this platform (e.g. Windows).
+
+    async def close(self):
+        await STATE_WRITER.flush()
+        await RIOT_CLIENT.close()
+        await stop_metrics_server()
+        await super().close()
+
 intents = discord.Intents.default()
 intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
+if SHARDED:
+    bot = ClashBot(command_prefix='!', intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+else:
+    bot = ClashBot(command_prefix='!', intents=intents)
+
+
+# --- METRICS ---
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+class Metrics:
+    """In-process counters, gauges and histograms, rendered in Prometheus text format."""
+    def __init__(self):
+        self.kinds = {}
+        self.help = {}
+        self.values = {}      # (name, labels) -> counter/gauge value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., count, sum]
+
+    def _key(self, name, kind, help_text, labels):
+        self.kinds.setdefault(name, kind)
+        if help_text: self.help.setdefault(name, help_text)
+        return name, tuple(sorted((labels or {}).items()))
+
+    def inc(self, name, labels=None, value=1, help_text=None):
+        key = self._key(name, 'counter', help_text, labels)
+        self.values[key] = self.values.get(key, 0) + value
+
+    def set(self, name, value, labels=None, help_text=None):
+        self.values[self._key(name, 'gauge', help_text, labels)] = value
+
+    def observe(self, name, seconds, labels=None, help_text=None):
+        key = self._key(name, 'histogram', help_text, labels)
+        if key not in self.histograms:
+            self.histograms[key] = [0] * (len(HISTOGRAM_BUCKETS) + 2)
+        hist = self.histograms[key]
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+        hist[-2] += 1
+        hist[-1] += seconds
+
+    def timed(self, name, help_text=None, **labels):
+        """Decorator observing the duration of a function or coroutine function."""
+        def decorator(func):
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def wrapper(*args, **kwargs):
+                    started = time.perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self.observe(name, time.perf_counter() - started, labels, help_text)
+            else:
+                @functools.wraps(func)
+                def wrapper(*args, **kwargs):
+                    started = time.perf_counter()
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        self.observe(name, time.perf_counter() - started, labels, help_text)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs: return ""
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+    def render(self):
+        lines = []
+        for name in sorted(self.kinds):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} {self.kinds[name]}")
+            for (metric, labels), value in self.values.items():
+                if metric == name:
+                    lines.append(f"{name}{self._labels(labels)} {value}")
+            for (metric, labels), hist in self.histograms.items():
+                if metric != name: continue
+                for bound, count in zip(HISTOGRAM_BUCKETS, hist):
+                    lines.append(f"{name}_bucket{self._labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{self._labels(labels, [('le', '+Inf')])} {hist[-2]}")
+                lines.append(f"{name}_count{self._labels(labels)} {hist[-2]}")
+                lines.append(f"{name}_sum{self._labels(labels)} {hist[-1]}")
+        return "\n".join(lines) + "\n"
+
+METRICS = Metrics()
+METRICS_RUNNER = None
+LOOP_LAG_TASK = None
+
+async def monitor_loop_lag():
+    """Sleeps LOOP_LAG_INTERVAL at a time; anything beyond that is time the loop was blocked."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0, time.perf_counter() - started - LOOP_LAG_INTERVAL)
+        METRICS.set('clash_event_loop_lag_seconds', lag, help_text="Event loop delay over the last interval")
+        METRICS.observe('clash_event_loop_lag_distribution_seconds', lag, help_text="Event loop delay samples")
+
+async def start_metrics_server():
+    """Serves /metrics; a failure (e.g. the port is taken) is logged and retried on the next on_ready."""
+    global METRICS_RUNNER, LOOP_LAG_TASK
+    if LOOP_LAG_TASK is None:
+        LOOP_LAG_TASK = asyncio.ensure_future(monitor_loop_lag())
+    if not METRICS_PORT or METRICS_RUNNER is not None:
+        return
 
+    async def handle_metrics(request):
+        return aiohttp.web.Response(text=METRICS.render(), content_type='text/plain', charset='utf-8')
+
+    app = aiohttp.web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = aiohttp.web.AppRunner(app)
+    try:
+        await runner.setup()
+        await aiohttp.web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+    except Exception as e:
+        print(f"Failed to serve metrics on {METRICS_HOST}:{METRICS_PORT}: {e}")
+        await runner.cleanup()
+        return
+    METRICS_RUNNER = runner
+    print(f"Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+async def stop_metrics_server():
+    global METRICS_RUNNER, LOOP_LAG_TASK
+    if LOOP_LAG_TASK is not None:
+        LOOP_LAG_TASK.cancel()
+        LOOP_LAG_TASK = None
+    if METRICS_RUNNER is not None:
+        await METRICS_RUNNER.cleanup()
+        METRICS_RUNNER = None
 
 # --- PERSISTENCE HELPERS ---
-def load_state():
-    """Loads state from JSON, ensuring all keys exist."""
-    if os.path.exists(DATA_FILE):
+EVENT_INDEX_KEYS = ('days', 'approved_ids', 'pending_ids')
+# Small top-level dicts stored as one JSON document each (the meta table in SQLite).
+STATE_DOCUMENT_KEYS = ('scheduler', 'announcements', 'commands')
+
+def empty_state():
+    return {'guilds': {}, 'days': {}, 'approved_ids': {}, 'pending_ids': {}, 'scheduler': {}, 'announcements': {}, 'commands': {}}
+
+def now_ms():
+    return datetime.datetime.now().timestamp() * 1000
+
+def content_hash(value):
+    """Stable fingerprint of a JSON-serializable value."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+def normalize_event_index(value):
+    """Event indexes are {id: ends_at_ms}. Older state stored plain lists; those are stamped with now."""
+    if isinstance(value, dict):
+        return {str(k): v for k, v in value.items()}
+    stamp = int(now_ms())
+    return {str(k): stamp for k in value or []}
+
+def prune_event_indexes(state, current_ms=None):
+    """Drops days/events whose tournament ended more than EVENT_RETENTION_DAYS ago. Returns the count."""
+    cutoff = (current_ms or now_ms()) - EVENT_RETENTION_DAYS * 24 * 60 * 60 * 1000
+    removed = 0
+    for key in EVENT_INDEX_KEYS:
+        index = state[key]
+        expired = [k for k, ends_at in index.items() if ends_at is None or ends_at < cutoff]
+        for k in expired:
+            del index[k]
+        removed += len(expired)
+    # Announcement payloads live as long as their event is pending or approved.
+    for event_id in [k for k in state['announcements'] if k not in state['approved_ids'] and k not in state['pending_ids']]:
+        del state['announcements'][event_id]
+        removed += 1
+    return removed
+
+def owns_guild(guild_id):
+    """Whether this process's shards serve the guild (always true when not sharded)."""
+    if not SHARDED: return True
+    return (int(guild_id) >> 22) % SHARD_COUNT in SHARD_IDS
+
+def snapshot_state(data):
+    """Copies the nested dicts/lists of the state so it can be encoded off the event loop."""
+    if isinstance(data, dict):
+        return {k: snapshot_state(v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [snapshot_state(v) for v in data]
+    return data
+
+def existing_state_file(path):
+    """The state file to read: `path`, or the legacy location when `path` doesn't exist yet."""
+    if os.path.exists(path) or not os.path.isfile(LEGACY_DATA_FILE):
+        return path
+    if os.path.abspath(LEGACY_DATA_FILE) == os.path.abspath(path):
+        return path
+    print(f"State file {path} not found; loading legacy {LEGACY_DATA_FILE} (saves go to {path}).")
+    return LEGACY_DATA_FILE
+
+def write_state_file(data, path=DATA_FILE):
+    """Encodes state and atomically replaces the file: temp file, fsync, rename."""
+    payload = json.dumps(data, separators=(',', ':'))
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.clash_state.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # Make the rename itself durable.
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+    except OSError:
+        pass
+
+# --- GUILD RECORDS ---
+# Signup roles are a bitmask: bit i set means ROLE_NAMES[i] was picked.
+ROLE_NAMES = ("Top", "Jungle", "Mid", "Bot", "Support", "Fill")
+ROLE_BITS = {name: 1 << i for i, name in enumerate(ROLE_NAMES)}
+FILL_BIT = ROLE_BITS["Fill"]
+
+# Per-guild fields (everything except the rosters); also the guilds table columns.
+GUILD_COLUMNS = ('channel_id', 'message_id', 'tournament_id', 'resolved_channel_id', 'region', 'announcement_hash',
+                 'outbox_event_id', 'outbox_attempts', 'outbox_next_at', 'outbox_created_at',
+                 'reminder_mode', 'reminders_sent', 'outbox_dropped_id')
+GUILD_DAYS = ('saturday', 'sunday')
+
+# Version 1 stored rosters as {str user_id: "Top, Mid"}; version 2 as {str user_id: role mask}.
+STATE_VERSION = 2
+
+def roles_to_mask(roles):
+    mask = 0
+    for role in roles:
+        mask |= ROLE_BITS.get(role.strip(), 0)
+    return mask
+
+def mask_to_roles(mask):
+    """The display string, in ROLE_NAMES order: "Top, Mid, Fill"."""
+    return ", ".join(name for name in ROLE_NAMES if mask & ROLE_BITS[name])
+
+class GuildRecord:
+    """A guild's config plus its two day rosters, each {int user_id: role mask}."""
+    __slots__ = GUILD_COLUMNS + GUILD_DAYS
+
+    def __init__(self, channel_id=None, message_id=None, tournament_id=None, resolved_channel_id=None, region=None,
+                 announcement_hash=None, outbox_event_id=None, outbox_attempts=0, outbox_next_at=0, outbox_created_at=0,
+                 reminder_mode=None, reminders_sent=0, outbox_dropped_id=None):
+        self.channel_id = channel_id
+        self.message_id = message_id
+        self.tournament_id = tournament_id
+        self.resolved_channel_id = resolved_channel_id
+        self.region = region
+        # content_hash of the announcement embed last posted or edited into message_id.
+        self.announcement_hash = announcement_hash
+        # Pending broadcast delivery, if any: the event to deliver, failed attempts so far,
+        # when to try next and when the job was queued (all ms).
+        self.outbox_event_id = outbox_event_id
+        self.outbox_attempts = outbox_attempts or 0
+        self.outbox_next_at = outbox_next_at or 0
+        self.outbox_created_at = outbox_created_at or 0
+        # Lock-in reminders: None/'off', 'channel' or 'dm'; reminders_sent has bit i set once
+        # day i of the current event was reminded.
+        self.reminder_mode = reminder_mode
+        self.reminders_sent = reminders_sent or 0
+        # Event whose delivery was given up after OUTBOX_MAX_ATTEMPTS. Broadcasts leave the guild
+        # alone for that event until its channel, roles or settings change; outbox_created_at is
+        # kept so a retry can still look for a post an earlier attempt made.
+        self.outbox_dropped_id = outbox_dropped_id
+        self.saturday = {}
+        self.sunday = {}
+
+    def config(self):
+        return tuple(getattr(self, column) for column in GUILD_COLUMNS)
+
+    def copy(self):
+        """Copy with its own roster dicts, so a snapshot can be written off the event loop."""
+        record = GuildRecord(*self.config())
+        record.saturday = dict(self.saturday)
+        record.sunday = dict(self.sunday)
+        return record
+
+    def to_dict(self):
+        data = {column: getattr(self, column) for column in GUILD_COLUMNS}
+        for day in GUILD_DAYS:
+            data[day] = {str(user_id): mask for user_id, mask in getattr(self, day).items()}
+        return data
+
+    @classmethod
+    def from_dict(cls, data, version=STATE_VERSION):
+        record = cls(*(data.get(column) for column in GUILD_COLUMNS))
+        for day in GUILD_DAYS:
+            roster = data.get(day) or {}
+            if version < 2:
+                roster = {user_id: roles_to_mask(roles.split(',')) for user_id, roles in roster.items()}
+            setattr(record, day, {int(user_id): mask for user_id, mask in roster.items()})
+        return record
+
+def guild_record(guild_id):
+    """The guild's record, created empty on first use."""
+    guild_id = str(guild_id)
+    if guild_id not in CLASH_STATE['guilds']:
+        CLASH_STATE['guilds'][guild_id] = GuildRecord()
+    return CLASH_STATE['guilds'][guild_id]
+
+class JsonStateBackend:
+    """Whole state in one JSON file, rewritten on every flush."""
+    def __init__(self, path=DATA_FILE):
+        self.path = path
+
+    def load(self):
+        """Loads state from JSON, falling back to the legacy file if that is where the guilds are."""
+        data = self.read(existing_state_file(self.path))
+        if (not data['guilds'] and os.path.isfile(LEGACY_DATA_FILE)
+                and os.path.abspath(LEGACY_DATA_FILE) != os.path.abspath(self.path)):
+            # An upgrade that started without the legacy file saved empty state over the new path.
+            legacy = self.read(LEGACY_DATA_FILE)
+            if legacy['guilds']:
+                print(f"State file {self.path} has no guilds; recovering {len(legacy['guilds'])} from {LEGACY_DATA_FILE}.")
+                return legacy
+        return data
+
+    def read(self, path):
+        """Reads one state file, ensuring all keys exist."""
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+
+                    # Ensure root structures exist (Migration/Safety)
+                    version = data.pop('version', 1)
+                    data['guilds'] = {gid: GuildRecord.from_dict(g, version) for gid, g in data.get('guilds', {}).items()}
+                    for key in EVENT_INDEX_KEYS:
+                        data[key] = normalize_event_index(data.get(key))
+                    for key in STATE_DOCUMENT_KEYS:
+                        if key not in data: data[key] = {}
+
+                    return data
+            except json.JSONDecodeError as e:
+                print(f"State file {path} is unreadable ({e}). Starting with empty state.")
+                return empty_state()
+        return empty_state()
+
+    def snapshot(self, data, guild_ids=None):
+        snapshot = snapshot_state({k: v for k, v in data.items() if k != 'guilds'})
+        snapshot['guilds'] = {gid: record.copy() for gid, record in data['guilds'].items()}
+        return snapshot
+
+    def write(self, snapshot):
+        document = {'version': STATE_VERSION}
+        document.update(snapshot)
+        document['guilds'] = {gid: record.to_dict() for gid, record in snapshot['guilds'].items()}
+        write_state_file(document, self.path)
+
+# Kinds stored in the event_ids table, mapped to their CLASH_STATE list.
+EVENT_ID_KINDS = {'day': 'days', 'approved': 'approved_ids', 'pending': 'pending_ids'}
+
+# Applied in order; PRAGMA user_version records how many have run.
+SQLITE_MIGRATIONS = [
+    """
+    CREATE TABLE guilds (
+        guild_id TEXT PRIMARY KEY,
+        channel_id INTEGER,
+        message_id INTEGER,
+        tournament_id TEXT
+    );
+    CREATE INDEX idx_guilds_tournament ON guilds (tournament_id);
+    CREATE TABLE signups (
+        guild_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        user_id TEXT NOT NULL,
+        roles TEXT NOT NULL,
+        PRIMARY KEY (guild_id, day, user_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE event_ids (
+        kind TEXT NOT NULL,
+        event_id NOT NULL, -- untyped: Riot day ids are ints, composite ids are strings
+        PRIMARY KEY (kind, event_id)
+    ) WITHOUT ROWID;
+    CREATE TABLE meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+    """,
+    """
+    ALTER TABLE guilds ADD COLUMN resolved_channel_id INTEGER;
+    """,
+    """
+    ALTER TABLE event_ids ADD COLUMN ends_at INTEGER;
+    CREATE INDEX idx_event_ids_ends_at ON event_ids (ends_at);
+    """,
+    """
+    ALTER TABLE guilds ADD COLUMN region TEXT;
+    CREATE INDEX idx_guilds_region ON guilds (region);
+    """,
+    """
+    CREATE TABLE leases (
+        name TEXT PRIMARY KEY,
+        holder TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    """,
+    """
+    CREATE TABLE signups_v2 (
+        guild_id TEXT NOT NULL,
+        day TEXT NOT NULL,
+        user_id INTEGER NOT NULL,
+        roles INTEGER NOT NULL, -- ROLE_BITS mask
+        PRIMARY KEY (guild_id, day, user_id)
+    ) WITHOUT ROWID;
+    INSERT INTO signups_v2 (guild_id, day, user_id, roles)
+    SELECT guild_id, day, CAST(user_id AS INTEGER),
+           (instr(roles, 'Top') > 0) | ((instr(roles, 'Jungle') > 0) << 1) | ((instr(roles, 'Mid') > 0) << 2)
+           | ((instr(roles, 'Bot') > 0) << 3) | ((instr(roles, 'Support') > 0) << 4) | ((instr(roles, 'Fill') > 0) << 5)
+    FROM signups;
+    DROP TABLE signups;
+    ALTER TABLE signups_v2 RENAME TO signups;
+    """,
+    """
+    ALTER TABLE guilds ADD COLUMN announcement_hash TEXT;
+    """,
+    """
+    ALTER TABLE guilds ADD COLUMN outbox_event_id TEXT;
+    ALTER TABLE guilds ADD COLUMN outbox_attempts INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE guilds ADD COLUMN outbox_next_at INTEGER NOT NULL DEFAULT 0;
+    ALTER TABLE guilds ADD COLUMN outbox_created_at INTEGER NOT NULL DEFAULT 0;
+    CREATE INDEX idx_guilds_outbox ON guilds (outbox_event_id) WHERE outbox_event_id IS NOT NULL;
+    """,
+    """
+    ALTER TABLE guilds ADD COLUMN reminder_mode TEXT;
+    ALTER TABLE guilds ADD COLUMN reminders_sent INTEGER NOT NULL DEFAULT 0;
+    """,
+    """
+    ALTER TABLE guilds ADD COLUMN outbox_dropped_id TEXT;
+    """,
+]
+
+class SqliteStateBackend:
+    """
+    Guilds, rosters and event ids in indexed SQLite tables (WAL mode).
+    Flushes diff the changed guilds against what was last persisted and write only those rows.
+    Several shard processes on one host can share one database: each loads and writes only the
+    guilds it owns, event ids are merged row by row, and refresh() picks up what other processes wrote.
+    """
+    def __init__(self, path=SQLITE_FILE, json_path=DATA_FILE):
+        self.path = path
+        self.json_path = json_path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.migrate()
+        # What the database currently holds, used to compute row diffs.
+        self.persisted_guilds = {}
+        self.persisted_ids = {kind: {} for kind in EVENT_ID_KINDS}
+        self.persisted_documents = {}
+
+    def migrate(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        for i, script in enumerate(SQLITE_MIGRATIONS[version:], start=version + 1):
+            self.conn.executescript(f"BEGIN; {script} PRAGMA user_version = {i}; COMMIT;")
+
+    def migrate_from_json(self):
+        """One-shot import of an existing JSON state file into an empty database."""
+        done = self.conn.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        json_path = existing_state_file(self.json_path)
+        if done or not os.path.exists(json_path):
+            return
+        if self.conn.execute("SELECT 1 FROM guilds LIMIT 1").fetchone():
+            return
+        data = JsonStateBackend(json_path).load()
+        self.write(self.snapshot(data))
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', ?)", (json_path,))
+        print(f"Migrated {len(data['guilds'])} guild(s) from {json_path} into {self.path}.")
+
+    def load(self):
+        self.migrate_from_json()
+        data = empty_state()
+        for row in self.conn.execute(f"SELECT guild_id, {', '.join(GUILD_COLUMNS)} FROM guilds"):
+            if not owns_guild(row[0]): continue
+            data['guilds'][row[0]] = GuildRecord(*row[1:])
+        for guild_id, day, user_id, roles in self.conn.execute(
+                "SELECT guild_id, day, user_id, roles FROM signups"):
+            if guild_id in data['guilds'] and day in GUILD_DAYS:
+                getattr(data['guilds'][guild_id], day)[user_id] = roles
+        self._load_shared(data)
+
+        self.persisted_guilds = {gid: record.copy() for gid, record in data['guilds'].items()}
+        return data
+
+    def _load_shared(self, data):
+        """Reads event ids and documents, the parts of state every process shares."""
+        stamp = int(now_ms())
+        for kind, event_id, ends_at in self.conn.execute("SELECT kind, event_id, ends_at FROM event_ids"):
+            if kind in EVENT_ID_KINDS:
+                data[EVENT_ID_KINDS[kind]][str(event_id)] = stamp if ends_at is None else ends_at
+        for key in STATE_DOCUMENT_KEYS:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (f"state:{key}",)).fetchone()
+            data[key] = json.loads(row[0]) if row else {}
+        self.persisted_ids = {kind: dict(data[key]) for kind, key in EVENT_ID_KINDS.items()}
+        self.persisted_documents = snapshot_state({key: data[key] for key in STATE_DOCUMENT_KEYS})
+
+    def refresh(self, data):
+        """Replaces the in-memory shared parts of `data` with what's in the database now."""
+        fresh = empty_state()
+        self._load_shared(fresh)
+        for key in list(EVENT_ID_KINDS.values()) + list(STATE_DOCUMENT_KEYS):
+            data[key].clear()
+            data[key].update(fresh[key])
+
+    def acquire_lease(self, name, holder, ttl):
+        """Takes or renews a named lease; returns True if `holder` owns it afterwards."""
+        current = time.time()
+        self.conn.execute(
+            "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+            "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+            (name, holder, current + ttl, current))
+        row = self.conn.execute("SELECT holder FROM leases WHERE name = ?", (name,)).fetchone()
+        return row is not None and row[0] == holder
+
+    def snapshot(self, data, guild_ids=None):
+        """Copies only the guilds marked dirty (all of them when guild_ids is None)."""
+        if guild_ids is None:
+            guild_ids = set(data['guilds']) | set(self.persisted_guilds)
+        snapshot = {
+            'guilds': {gid: data['guilds'][gid].copy() if gid in data['guilds'] else None for gid in guild_ids},
+        }
+        for key in EVENT_ID_KINDS.values():
+            snapshot[key] = dict(data[key])
+        for key in STATE_DOCUMENT_KEYS:
+            snapshot[key] = snapshot_state(data.get(key, {}))
+        return snapshot
+
+    def write(self, snapshot):
+        cur = self.conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        try:
+            for guild_id, guild in snapshot['guilds'].items():
+                self._write_guild(cur, guild_id, guild)
+            for kind, key in EVENT_ID_KINDS.items():
+                current = snapshot[key]
+                previous = self.persisted_ids[kind]
+                cur.executemany("INSERT OR REPLACE INTO event_ids (kind, event_id, ends_at) VALUES (?, ?, ?)",
+                                [(kind, i, ends_at) for i, ends_at in current.items() if previous.get(i) != ends_at])
+                cur.executemany("DELETE FROM event_ids WHERE kind = ? AND event_id = ?",
+                                [(kind, i) for i in previous if i not in current])
+            for key in STATE_DOCUMENT_KEYS:
+                if snapshot[key] != self.persisted_documents.get(key):
+                    cur.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                (f"state:{key}", json.dumps(snapshot[key])))
+            cur.execute("COMMIT")
+        except BaseException:
+            cur.execute("ROLLBACK")
+            raise
+
+        for guild_id, guild in snapshot['guilds'].items():
+            if guild is None:
+                self.persisted_guilds.pop(guild_id, None)
+            else:
+                self.persisted_guilds[guild_id] = guild
+        for kind, key in EVENT_ID_KINDS.items():
+            self.persisted_ids[kind] = snapshot[key]
+        for key in STATE_DOCUMENT_KEYS:
+            self.persisted_documents[key] = snapshot[key]
+
+    def _write_guild(self, cur, guild_id, guild):
+        previous = self.persisted_guilds.get(guild_id)
+        if guild is None:
+            if previous is not None:
+                cur.execute("DELETE FROM signups WHERE guild_id = ?", (guild_id,))
+                cur.execute("DELETE FROM guilds WHERE guild_id = ?", (guild_id,))
+            return
+
+        config = guild.config()
+        if previous is None or config != previous.config():
+            cur.execute(
+                f"INSERT INTO guilds (guild_id, {', '.join(GUILD_COLUMNS)}) "
+                f"VALUES (?{', ?' * len(GUILD_COLUMNS)}) "
+                f"ON CONFLICT (guild_id) DO UPDATE SET "
+                f"{', '.join(f'{column} = excluded.{column}' for column in GUILD_COLUMNS)}",
+                (guild_id,) + config)
+
+        for day in GUILD_DAYS:
+            roster = getattr(guild, day)
+            old_roster = getattr(previous, day) if previous else {}
+            cur.executemany(
+                "INSERT OR REPLACE INTO signups (guild_id, day, user_id, roles) VALUES (?, ?, ?, ?)",
+                [(guild_id, day, uid, roles) for uid, roles in roster.items() if old_roster.get(uid) != roles])
+            cur.executemany(
+                "DELETE FROM signups WHERE guild_id = ? AND day = ? AND user_id = ?",
+                [(guild_id, day, uid) for uid in old_roster if uid not in roster])
+
+# Filesystem types SQLite's WAL locking and shared memory don't work on reliably.
+NETWORK_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs', '9p', 'glusterfs', 'ceph', 'fuse.s3fs'}
+
+def filesystem_type(path):
+    """Type of the filesystem `path` lives on, from /proc/mounts (None where that isn't available)."""
+    path = os.path.realpath(os.path.dirname(os.path.abspath(path)))
+    best, fs_type = '', None
+    try:
+        with open('/proc/mounts') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3: continue
+                mount_point = fields[1].replace('\\040', ' ')
+                if (path == mount_point or path.startswith(mount_point.rstrip('/') + '/')) and len(mount_point) >= len(best):
+                    best, fs_type = mount_point, fields[2]
+    except OSError:
+        return None
+    return fs_type
+
+def make_state_backend():
+    if SHARDED and STATE_BACKEND != 'sqlite':
+        raise SystemExit("Sharded mode needs STATE_BACKEND=sqlite, a database shared by every shard process.")
+    if STATE_BACKEND == 'sqlite':
+        fs_type = filesystem_type(SQLITE_FILE)
+        if fs_type in NETWORK_FILESYSTEMS:
+            if SHARDED:
+                raise SystemExit(f"SQLITE_FILE {SQLITE_FILE} is on {fs_type}. Sharded mode is single-host only: "
+                                 "put the database on a local disk shared by the shard processes of one machine.")
+            print(f"Warning: SQLITE_FILE {SQLITE_FILE} is on {fs_type}; SQLite in WAL mode may corrupt it there.")
+        return SqliteStateBackend()
+    if STATE_BACKEND != 'json':
+        print(f"Unknown STATE_BACKEND '{STATE_BACKEND}', using json.")
+    return JsonStateBackend()
+
+class StateWriter:
+    """Coalesces save_state() calls into debounced flushes of the backend, run off the event loop."""
+    def __init__(self, backend, delay=SAVE_DELAY, max_pending=SAVE_MAX_PENDING):
+        self.backend = backend
+        self.delay = delay
+        self.max_pending = max_pending
+        self.data = None
+        self.pending = 0
+        # Guild ids changed since the last flush; None means "all of them".
+        self.dirty_guilds = set()
+        # Whether the shared parts (event ids, documents) changed: saves that name no guild.
+        self.shared_dirty = False
+        self.flushes = 0
+        self._timer = None
+        self._tasks = set()
+        self._lock = asyncio.Lock()
+
+    def mark_dirty(self, data, guild_ids=None):
+        self.data = data
+        self.pending += 1
+        if guild_ids is None:
+            self.dirty_guilds = None
+            self.shared_dirty = True
+        elif not guild_ids:
+            self.shared_dirty = True
+        elif self.dirty_guilds is not None:
+            self.dirty_guilds.update(str(gid) for gid in guild_ids)
+        if self.pending == self.max_pending:
+            self._schedule(0)
+        elif self._timer is None:
+            self._schedule(self.delay)
+
+    def _schedule(self, delay):
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self):
+        """Writes the latest state if anything changed since the last flush."""
+        async with self._lock:
+            await self._flush_locked()
+
+    async def refresh(self, data):
+        """Flushes, then reloads the shared parts of state other processes may have written."""
+        async with self._lock:
+            await self._flush_locked()
+            # Unflushed local changes to shared parts win until they are written.
+            if not self.shared_dirty:
+                self.backend.refresh(data)
+
+    async def call_backend(self, method, *args):
+        """Runs a backend method in a thread under the flush lock, so it never overlaps a write
+        on the backend's shared connection."""
+        async with self._lock:
+            return await asyncio.to_thread(method, *args)
+
+    async def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.pending or self.data is None:
+            return
+
+        # Snapshot on the loop (cheap dict copies), encode and write in a thread.
+        started = time.perf_counter()
+        snapshot = self.backend.snapshot(self.data, self.dirty_guilds)
+        METRICS.observe('clash_state_snapshot_seconds', time.perf_counter() - started,
+                        help_text="Event loop time spent snapshotting state for a flush")
+        pending, self.pending = self.pending, 0
+        dirty, self.dirty_guilds = self.dirty_guilds, set()
+        shared_dirty, self.shared_dirty = self.shared_dirty, False
         try:
-            with open(DATA_FILE, "r") as f:
-                data = json.load(f)
-                
-                # Ensure root structures exist (Migration/Safety)
-                if 'guilds' not in data: data['guilds'] = {}
-                if 'days' not in data: data['days'] = []
-                if 'approved_ids' not in data: data['approved_ids'] = []
-                if 'pending_ids' not in data: data['pending_ids'] = []
-                    
-                return data
-        except json.JSONDecodeError:
-            return {'guilds': {}, 'days': [], 'approved_ids': [], 'pending_ids': []}
-    return {'guilds': {}, 'days': [], 'approved_ids': [], 'pending_ids': []}
-
-def save_state(data):
-    """Saves state to JSON file."""
-    with open(DATA_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+            started = time.perf_counter()
+            await asyncio.to_thread(self.backend.write, snapshot)
+            METRICS.observe('clash_state_write_seconds', time.perf_counter() - started,
+                            help_text="Time to encode and write state in the writer thread")
+            self.flushes += 1
+        except Exception as e:
+            print(f"Failed to save state: {e}")
+            METRICS.inc('clash_state_write_failures_total', help_text="Failed state flushes")
+            self.pending += pending
+            self.dirty_guilds = None if dirty is None or self.dirty_guilds is None else self.dirty_guilds | dirty
+            self.shared_dirty = self.shared_dirty or shared_dirty
+            if self._timer is None:
+                self._schedule(self.delay)
+
+STATE_STORE = make_state_backend()
+STATE_WRITER = StateWriter(STATE_STORE)
+
+def make_event_id(region, related_ids):
+    return f"{region}:{'_'.join(related_ids)}"
+
+def split_event_id(event_id):
+    """Returns (region, tournament ids). Ids from before multi-region support belong to RIOT_REGION."""
+    region, sep, ids = (event_id or '').rpartition(':')
+    if not sep:
+        region = RIOT_REGION
+    return region, [i for i in ids.split('_') if i]
+
+def migrate_event_ids(data):
+    """Prefixes event ids saved before multi-region support with RIOT_REGION. Returns True if any changed."""
+    changed = False
+    for key in ('approved_ids', 'pending_ids'):
+        for event_id in [k for k in data[key] if ':' not in k]:
+            data[key][make_event_id(RIOT_REGION, [event_id])] = data[key].pop(event_id)
+            changed = True
+    for guild in data['guilds'].values():
+        if guild.tournament_id and ':' not in guild.tournament_id:
+            guild.tournament_id = make_event_id(RIOT_REGION, [guild.tournament_id])
+            changed = True
+    return changed
+
+def load_state():
+    data = STATE_STORE.load()
+    if migrate_event_ids(data):
+        save_state(data)
+    return data
+
+@METRICS.timed('clash_save_state_seconds', help_text="Event loop time spent in save_state")
+def save_state(data, guild_ids=None):
+    """
+    Marks state dirty; it's flushed shortly after, or written immediately without a running loop.
+    guild_ids names the guilds that changed (None = any guild may have changed).
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        STATE_STORE.write(STATE_STORE.snapshot(data, guild_ids))
+        return
+    STATE_WRITER.mark_dirty(data, guild_ids)
+
+# --- RATE LIMITING ---
+def parse_rate_limits(spec):
+    """Parses "20:1,100:120" into [(20, 1.0), (100, 120.0)]."""
+    limits = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part: continue
+        count, seconds = part.split(':')
+        limits.append((int(count), float(seconds)))
+    return limits
+
+class TokenBucket:
+    """Holds up to `capacity` tokens, refilled evenly over `period` seconds."""
+    def __init__(self, capacity, period):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def delay(self):
+        """Refills the bucket and returns the seconds until one token is available."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1: return 0
+        return (1 - self.tokens) / self.rate
+
+class RateLimiter:
+    """Waits until every bucket has a token, e.g. Riot's per-second and per-2-minute limits together."""
+    def __init__(self, limits):
+        self.buckets = [TokenBucket(count, seconds) for count, seconds in limits]
+        self.blocked_until = 0
+        self._lock = asyncio.Lock()
+
+    def block(self, seconds):
+        """Pauses all callers, used when the server answers 429 with a Retry-After."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                wait = self.blocked_until - time.monotonic()
+                for bucket in self.buckets:
+                    wait = max(wait, bucket.delay())
+                if wait <= 0: break
+                await asyncio.sleep(wait)
+            for bucket in self.buckets:
+                bucket.tokens -= 1
+
+# --- RIOT API CLIENT ---
+class RiotAPIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"{status} - {message}")
+        self.status = status
+
+class RiotClient:
+    """Asyncio Riot API client sharing one pooled session, with timeouts, retries and rate limiting."""
+    def __init__(self, api_key, limits, timeout=RIOT_TIMEOUT, max_retries=RIOT_MAX_RETRIES):
+        self.api_key = api_key
+        self.limits = limits
+        # Riot enforces application limits per platform region.
+        self.limiters = {}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._session = None
+
+    def session(self):
+        # Created lazily so it binds to the running event loop.
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"X-Riot-Token": self.api_key or ""},
+                connector=aiohttp.TCPConnector(limit=RIOT_POOL_SIZE, ttl_dns_cache=300),
+            )
+        return self._session
+
+    def limiter(self, region):
+        if region not in self.limiters:
+            self.limiters[region] = RateLimiter(self.limits)
+        return self.limiters[region]
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    @staticmethod
+    def backoff(attempt):
+        return min(60, 2 ** attempt) + random.uniform(0, 1)
+
+    async def get_json(self, region, path):
+        """GETs a Riot endpoint, retrying 429/5xx and network errors with backoff; a bad 200 body fails at once."""
+        url = RIOT_API_BASE.format(region=region) + path
+        limiter = self.limiter(region)
+        error = None
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            started = time.perf_counter()
+            status = 'error'
+            try:
+                async with self.session().get(url) as response:
+                    status = response.status
+                    if response.status == 200:
+                        try:
+                            return await response.json()
+                        except (aiohttp.ContentTypeError, ValueError) as e:
+                            # A malformed payload won't fix itself on retry; fail the fetch now.
+                            raise RiotAPIError(200, f"invalid JSON payload: {e}")
+                    text = await response.text()
+                    error = RiotAPIError(response.status, text)
+                    if response.status != 429 and response.status < 500:
+                        raise error
+                    delay = self.backoff(attempt)
+                    retry_after = response.headers.get('Retry-After')
+                    if retry_after:
+                        try:
+                            delay = float(retry_after)
+                        except ValueError:
+                            pass
+                    if response.status == 429:
+                        limiter.block(delay)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = RiotAPIError(0, repr(e))
+                delay = self.backoff(attempt)
+            finally:
+                METRICS.observe('clash_riot_request_seconds', time.perf_counter() - started,
+                                {'region': region}, help_text="Riot API request latency")
+                METRICS.inc('clash_riot_requests_total', {'region': region, 'status': status},
+                            help_text="Riot API requests by status")
+
+            if attempt < self.max_retries:
+                print(f"Riot API {path} failed ({error}), retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+        raise error
+
+RIOT_CLIENT = RiotClient(RIOT_API_KEY, parse_rate_limits(RIOT_RATE_LIMITS))
+DISCORD_LIMITER = RateLimiter(parse_rate_limits(DISCORD_RATE_LIMITS))
 
 # --- RIOT API FUNCTIONS ---
-def get_upcoming_clash_tournaments():
-    url = f"https://{RIOT_REGION}.api.riotgames.com/lol/clash/v1/tournaments"
-    headers = {"X-Riot-Token": RIOT_API_KEY}
+@METRICS.timed('clash_fetch_tournaments_seconds', help_text="Time to fetch one region's schedule, retries included")
+async def get_upcoming_clash_tournaments(region=RIOT_REGION):
+    try:
+        tournaments = await RIOT_CLIENT.get_json(region, "/lol/clash/v1/tournaments")
+    except RiotAPIError as e:
+        print(f"Error fetching data for {region}: {e}")
+        return None
+
+    upcoming = []
+    seen_days = set()
+    current_time = now_ms()
+
     try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            tournaments = response.json()
-            upcoming = []
-            current_time = datetime.datetime.now().timestamp() * 1000
-
-            for tournament in tournaments:
-                for day in tournament.get('schedule', []):
-                    if day['startTime'] > current_time:
-                        day['tournament_id'] = tournament['id']
-                        day['name'] = tournament['nameKey'].replace('_', ' ').title()
-                        day['secondary_name'] = tournament['nameKeySecondary'].replace('_', ' ').title()
-                        upcoming.append(day)
-
-            upcoming.sort(key=lambda x: x['startTime'])
-            return upcoming
+        for tournament in tournaments:
+            for day in tournament.get('schedule', []):
+                if day['startTime'] > current_time and day['id'] not in seen_days:
+                    seen_days.add(day['id'])
+                    day['tournament_id'] = tournament['id']
+                    day['region'] = region
+                    day['name'] = tournament['nameKey'].replace('_', ' ').title()
+                    day['secondary_name'] = tournament['nameKeySecondary'].replace('_', ' ').title()
+                    upcoming.append(day)
+    except (KeyError, TypeError, AttributeError, ValueError) as e:
+        # Treat a malformed payload like a failed fetch: keep what we know, retry later.
+        print(f"Malformed Clash data for {region}: {e!r}")
+        return None
+
+    upcoming.sort(key=lambda x: x['startTime'])
+    return upcoming
+
+async def fetch_clash_schedules(regions=None):
+    """Polls several regions concurrently. Returns {region: upcoming days, or None if the fetch failed}."""
+    regions = list(dict.fromkeys(regions or RIOT_REGIONS))
+    results = await asyncio.gather(*(get_upcoming_clash_tournaments(r) for r in regions))
+    return dict(zip(regions, results))
+
+def guild_region(guild_data):
+    return (guild_data.region if guild_data else None) or RIOT_REGION
+
+# --- ROSTER RENDERING ---
+# Discord embed limits.
+EMBED_FIELD_LIMIT = 1024
+EMBED_TOTAL_LIMIT = 6000
+EMBED_MAX_FIELDS = 25
+# Chunks leave headroom under the field limit for a trailing "+N more" marker.
+ROSTER_CHUNK_LIMIT = EMBED_FIELD_LIMIT - 24
+ROSTER_DAYS = (('saturday', "🛰️ Saturday"), ('sunday', "🌞 Sunday"))
+ROLE_EMOJI = {"Top": "🛡️", "Jungle": "🌲", "Mid": "🔮", "Bot": "🏹", "Support": "🩹", "Fill": "🔄"}
+
+def format_roster_line(user_id, mask):
+    return f"<@{user_id}> *({mask_to_roles(mask)})*"
+
+def roster_field_name(label, fields):
+    """"🛰️ Saturday (7) · 🛡️2 🌲1 🔮3 🏹1 🩹2 🔄1" -- role counts are kept up to date by RosterFields."""
+    if not fields:
+        return f"{label} (0)"
+    counts = " ".join(f"{ROLE_EMOJI[name]}{n}" for name, n in zip(ROLE_NAMES, fields.role_counts) if n)
+    return f"{label} ({len(fields)}) · {counts}"
+
+class RosterFields:
+    """
+    One day's roster split into embed-field-sized chunks of cached lines.
+    A signup change patches its own chunk, so only that chunk's text is rebuilt.
+    """
+    def __init__(self, roster=None):
+        self.chunks = []   # [{user_id: line}], each joins to at most ROSTER_CHUNK_LIMIT chars
+        self.sizes = []    # per chunk: sum of len(line) + 1
+        self.values = []   # per chunk: joined text, None when stale
+        self.owner = {}    # user_id -> chunk index
+        self.masks = {}    # user_id -> role mask, so a change can adjust role_counts
+        self.role_counts = [0] * len(ROLE_NAMES)
+        for user_id, mask in (roster or {}).items():
+            self.set(user_id, mask)
+
+    def __len__(self):
+        return len(self.owner)
+
+    def _count(self, mask, delta):
+        for i in range(len(ROLE_NAMES)):
+            self.role_counts[i] += delta * (mask >> i & 1)
+
+    def set(self, user_id, mask):
+        line = format_roster_line(user_id, mask)
+        self._count(self.masks.get(user_id, 0), -1)
+        self._count(mask, 1)
+        self.masks[user_id] = mask
+        if user_id in self.owner:
+            i = self.owner[user_id]
+            self.sizes[i] += len(line) - len(self.chunks[i][user_id])
+            self.chunks[i][user_id] = line
+            self.values[i] = None
+            if self.sizes[i] - 1 > ROSTER_CHUNK_LIMIT:
+                self._resplit(i)
+            return
+
+        if not self.chunks or self.sizes[-1] + len(line) > ROSTER_CHUNK_LIMIT:
+            self.chunks.append({})
+            self.sizes.append(0)
+            self.values.append(None)
+        i = len(self.chunks) - 1
+        self.chunks[i][user_id] = line
+        self.sizes[i] += len(line) + 1
+        self.values[i] = None
+        self.owner[user_id] = i
+
+    def remove(self, user_id):
+        i = self.owner.pop(user_id, None)
+        if i is None: return
+        self._count(self.masks.pop(user_id), -1)
+        self.sizes[i] -= len(self.chunks[i].pop(user_id)) + 1
+        self.values[i] = None
+        if not self.chunks[i]:
+            self._resplit(i)
+
+    def _resplit(self, start):
+        """Re-packs chunks from `start` onwards (after an overflow or an emptied chunk)."""
+        entries = [item for chunk in self.chunks[start:] for item in chunk.items()]
+        del self.chunks[start:], self.sizes[start:], self.values[start:]
+        for user_id, _ in entries:
+            del self.owner[user_id]
+        for user_id, line in entries:
+            if not self.chunks[start:] or self.sizes[-1] + len(line) > ROSTER_CHUNK_LIMIT:
+                self.chunks.append({})
+                self.sizes.append(0)
+                self.values.append(None)
+            self.chunks[-1][user_id] = line
+            self.sizes[-1] += len(line) + 1
+            self.owner[user_id] = len(self.chunks) - 1
+
+    def field_values(self):
+        for i, value in enumerate(self.values):
+            if value is None:
+                self.values[i] = "\n".join(self.chunks[i].values())
+        return self.values
+
+class RosterRenderer:
+    """Keeps a RosterFields per (guild, day) in step with state and lays them out as embed fields."""
+    def __init__(self):
+        self.rosters = {}  # (guild_id, day) -> (roster dict the fields mirror, RosterFields)
+
+    def get(self, guild_id, day, roster):
+        key = (str(guild_id), day)
+        cached = self.rosters.get(key)
+        # Rebuild only if state was replaced behind our back (new post, reload): a different dict.
+        if cached is None or cached[0] is not roster:
+            cached = self.rosters[key] = (roster, RosterFields(roster))
+        return cached[1]
+
+    def set(self, guild_id, day, user_id, mask, roster):
+        """Records a signup in both the cache and `roster` (patch first, so no rebuild is needed)."""
+        self.get(guild_id, day, roster).set(user_id, mask)
+        roster[user_id] = mask
+
+    def remove(self, guild_id, day, user_id, roster):
+        self.get(guild_id, day, roster).remove(user_id)
+        roster.pop(user_id, None)
+
+    def reset(self, guild_id=None):
+        if guild_id is None:
+            self.rosters.clear()
+            return
+        for day, _ in ROSTER_DAYS:
+            self.rosters.pop((str(guild_id), day), None)
+
+    def render(self, guild_id, guild_data, embed):
+        """
+        Replaces the roster fields of an announcement embed (everything after the schedule field).
+        Days sit side by side; long rosters continue in further field pairs. Once the embed's
+        character or field budget is spent the rest is summarized as "+N more".
+        """
+        schedule = embed.fields[0] if embed.fields else None
+        embed.clear_fields()
+        budget = EMBED_TOTAL_LIMIT - len(embed.title or '') - len(embed.description or '') - len(embed.footer.text or '')
+        if schedule:
+            embed.add_field(name=schedule.name, value=schedule.value, inline=False)
+            budget -= len(schedule.name) + len(schedule.value)
+
+        columns = []
+        for day, label in ROSTER_DAYS:
+            roster = getattr(guild_data, day)
+            fields = self.get(guild_id, day, roster)
+            values = fields.field_values() if roster else ["No one yet."]
+            counts = [len(chunk) for chunk in fields.chunks] if roster else [0]
+            columns.append((roster_field_name(label, fields), f"{label} (cont.)", values, counts, len(roster)))
+
+        # Reserve room for the first field of each day and a possible "+N more" line.
+        budget -= sum(len(first) + len(values[0]) + 40 for first, _, values, _, _ in columns)
+        shown = [1, 1]
+        rows = max(len(c[2]) for c in columns)
+        for row in range(1, rows):
+            for d, (_, cont, values, _, _) in enumerate(columns):
+                if shown[d] != row or row >= len(values): continue
+                cost = len(cont) + len(values[row])
+                if cost > budget or 2 * (row + 1) + 1 > EMBED_MAX_FIELDS: continue
+                budget -= cost
+                shown[d] += 1
+
+        for row in range(max(shown)):
+            for d, (first, cont, values, counts, total) in enumerate(columns):
+                if row >= shown[d]:
+                    embed.add_field(name="\u200b", value="\u200b", inline=True)
+                    continue
+                value = values[row]
+                if row == shown[d] - 1 and shown[d] < len(values):
+                    value = f"{value}\n*+{total - sum(counts[:shown[d]])} more*"
+                embed.add_field(name=first if row == 0 else cont, value=value, inline=True)
+        return embed
+
+ROSTERS = RosterRenderer()
+
+# --- TEAM BUILDER ---
+TEAM_ROLES = ROLE_NAMES[:5]
+ALL_ROLES_MASK = (1 << len(TEAM_ROLES)) - 1
+
+def playable_roles(mask):
+    """The signup's role mask over TEAM_ROLES; Fill means any role."""
+    return ALL_ROLES_MASK if mask & FILL_BIT else mask & ALL_ROLES_MASK
+
+def max_flow(capacity, source, sink):
+    """Edmonds-Karp over {node: {node: capacity}}; returns (value, flow dict)."""
+    flow = {u: {v: 0 for v in edges} for u, edges in capacity.items()}
+    for u, edges in capacity.items():
+        for v in edges:
+            flow.setdefault(v, {}).setdefault(u, 0)
+    residual = lambda u, v: capacity.get(u, {}).get(v, 0) - flow[u][v]
+    total = 0
+    while True:
+        parent = {source: None}
+        queue = [source]
+        for u in queue:
+            for v in flow[u]:
+                if v not in parent and residual(u, v) > 0:
+                    parent[v] = u
+                    queue.append(v)
+            if sink in parent: break
+        if sink not in parent:
+            return total, flow
+        path = []
+        v = sink
+        while parent[v] is not None:
+            path.append((parent[v], v))
+            v = parent[v]
+        push = min(residual(u, v) for u, v in path)
+        for u, v in path:
+            flow[u][v] += push
+            flow[v][u] -= push
+        total += push
+
+def build_teams(roster):
+    """
+    Splits a day's roster {user_id: role mask} into as many full teams (one player per role) as possible.
+    Players are grouped by role set, so the flow network has at most 32 + 5 nodes whatever the roster
+    size; a binary search finds the largest team count k whose role->sink capacity k saturates.
+    Earlier signups win ties. Returns (teams as [{role: user_id}], leftover user ids).
+    """
+    by_mask = {}
+    for user_id, mask in roster.items():
+        by_mask.setdefault(playable_roles(mask), []).append(user_id)
+
+    def solve(k):
+        capacity = {'source': {}}
+        for mask, players in by_mask.items():
+            capacity['source'][mask] = len(players)
+            capacity[mask] = {role: len(players) for i, role in enumerate(TEAM_ROLES) if mask >> i & 1}
+        for role in TEAM_ROLES:
+            capacity[role] = {'sink': k}
+        return max_flow(capacity, 'source', 'sink')
+
+    low, high = 0, len(roster) // len(TEAM_ROLES)
+    best = solve(0)[1]
+    while low < high:
+        k = (low + high + 1) // 2
+        value, flow = solve(k)
+        if value == k * len(TEAM_ROLES):
+            low, best = k, flow
         else:
-            print(f"Error fetching data: {response.status_code} - {response.text}")
-            return []
-    except Exception as e:
-        print(f"Exception during API call: {e}")
-        return []
+            high = k - 1
+
+    slots = {role: [] for role in TEAM_ROLES}
+    leftovers = []
+    for mask, players in by_mask.items():
+        quota = [(role, best.get(mask, {}).get(role, 0)) for role in TEAM_ROLES]
+        for user_id in players:
+            for n, (role, remaining) in enumerate(quota):
+                if remaining > 0:
+                    slots[role].append(user_id)
+                    quota[n] = (role, remaining - 1)
+                    break
+            else:
+                leftovers.append(user_id)
+    teams = [{role: slots[role][t] for role in TEAM_ROLES} for t in range(low)]
+    # Keep the reported order stable: leftovers in signup order.
+    order = {user_id: n for n, user_id in enumerate(roster)}
+    leftovers.sort(key=order.get)
+    return teams, leftovers
+
+def chunk_lines(lines, limit=EMBED_FIELD_LIMIT, sep="\n"):
+    """Groups lines into sep-joined chunks of at most limit characters."""
+    chunks, current, size = [], [], 0
+    for line in lines:
+        if current and size + len(line) + len(sep) > limit:
+            chunks.append(sep.join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + len(sep)
+    if current:
+        chunks.append(sep.join(current))
+    return chunks
+
+def build_teams_embed(guild_data, days):
+    """Lays out the teams and leftovers for each requested day, trimmed to the embed limits."""
+    embed = discord.Embed(title="🏆 Clash Teams", color=0xC89B3C)
+    budget = EMBED_TOTAL_LIMIT - len(embed.title)
+    for day, label in ROSTER_DAYS:
+        if day not in days: continue
+        roster = getattr(guild_data, day)
+        teams, leftovers = build_teams(roster)
+        lines = [f"**Team {n}:** " + " ".join(f"{ROLE_EMOJI[role]}<@{team[role]}>" for role in TEAM_ROLES)
+                 for n, team in enumerate(teams, 1)] or ["Not enough players for a full team."]
+        mentions = [f"<@{user_id}>" for user_id in leftovers]
+        lines += ["**Left over:** " + chunk for chunk in chunk_lines(mentions, ROSTER_CHUNK_LIMIT - 20, ", ")]
+
+        # Leave room for the other day's fields and a "+N more" marker.
+        chunks = chunk_lines(lines, ROSTER_CHUNK_LIMIT)
+        for n, chunk in enumerate(chunks):
+            name = f"{label} ({len(teams)} teams, {len(roster)} signups)" if n == 0 else f"{label} (cont.)"
+            if len(embed.fields) + 1 >= EMBED_MAX_FIELDS or len(name) + len(chunk) > budget - 400:
+                shown = sum(c.count("\n") + 1 for c in chunks[:n])
+                embed.add_field(name=f"{label} (cont.)", value=f"*+{len(lines) - shown} more lines*", inline=False)
+                break
+            embed.add_field(name=name, value=chunk, inline=False)
+            budget -= len(name) + len(chunk)
+    return embed
 
 # --- DISCORD UI ---
+class EmbedEditScheduler:
+    """
+    Coalesces roster edits: at most one embed edit per message per EMBED_EDIT_WINDOW seconds.
+    The first change is pushed right away; changes during the window are folded into one trailing
+    edit rendered from the latest state.
+    """
+    def __init__(self, window=EMBED_EDIT_WINDOW):
+        self.window = window
+        self.dirty = {}
+        self.tasks = {}
+
+    def schedule(self, message, view):
+        self.dirty[message.id] = (message, view)
+        if message.id not in self.tasks:
+            self.tasks[message.id] = asyncio.ensure_future(self._run(message.id))
+
+    async def _run(self, message_id):
+        try:
+            while message_id in self.dirty:
+                message, view = self.dirty.pop(message_id)
+                try:
+                    await DISCORD_LIMITER.acquire()
+                    await message.edit(embed=view.update_embed(message.embeds[0]))
+                except discord.HTTPException as e:
+                    print(f"Failed to update roster message {message_id}: {e}")
+                await asyncio.sleep(self.window)
+        finally:
+            self.tasks.pop(message_id, None)
+
+EMBED_EDITS = EmbedEditScheduler()
+
 class RoleSelect(Select):
     def __init__(self, day, parent_view, main_message):
         self.day = day
         self.parent_view = parent_view
         self.main_message = main_message
-        options = [
-            discord.SelectOption(label="Top", emoji="🛡️"),
-            discord.SelectOption(label="Jungle", emoji="🌲"),
-            discord.SelectOption(label="Mid", emoji="🔮"),
-            discord.SelectOption(label="Bot", emoji="🏹"),
-            discord.SelectOption(label="Support", emoji="🩹"),
-            discord.SelectOption(label="Fill", emoji="🔄"),
-        ]
+        options = [discord.SelectOption(label=name, emoji=ROLE_EMOJI[name]) for name in ROLE_NAMES]
         super().__init__(placeholder=f"Select roles for {day}...", min_values=1, max_values=6, options=options)
 
+    @METRICS.timed('clash_interaction_seconds', help_text="RSVP interaction handling time", action='role_select')
     async def callback(self, interaction: discord.Interaction):
-        user_id = str(interaction.user.id)
-        selected_roles = self.values
-        role_order = ["Top", "Jungle", "Mid", "Bot", "Support", "Fill"]
-        selected_roles.sort(key=lambda r: role_order.index(r) if r in role_order else 99)
-        roles_display = ", ".join(selected_roles)
-
-        if self.day == "Saturday":
-            self.parent_view.state['saturday'][user_id] = roles_display
-        else:
-            self.parent_view.state['sunday'][user_id] = roles_display
+        user_id = interaction.user.id
+        mask = roles_to_mask(self.values)
+
+        day_key = 'saturday' if self.day == "Saturday" else 'sunday'
+        roster = getattr(self.parent_view.state, day_key)
+        new_signup = user_id not in roster
+        ROSTERS.set(self.parent_view.guild_id, day_key, user_id, mask, roster)
+        if new_signup and self.parent_view.state.reminder_mode == 'dm':
+            # A longer roster means a longer DM wave, so its reminder has to start earlier.
+            schedule_guild_reminders(self.parent_view.guild_id)
 
         self.parent_view.save_current_state()
-        new_embed = self.parent_view.update_embed(self.main_message.embeds[0])
-        await self.main_message.edit(embed=new_embed)
-        await interaction.response.edit_message(content=f"✅ Registered for {self.day} as: {roles_display}", view=self.view)
+        await interaction.response.edit_message(content=f"✅ Registered for {self.day} as: {mask_to_roles(mask)}", view=self.view)
+        EMBED_EDITS.schedule(self.main_message, self.parent_view)
 
 class EphemeralRSVPView(View):
     def __init__(self, day, parent_view, main_message):
@@ -125,124 +1446,159 @@ class EphemeralRSVPView(View):
         self.add_item(RoleSelect(day, parent_view, main_message))
 
     @discord.ui.button(label="Remove Me ❌", style=discord.ButtonStyle.red)
+    @METRICS.timed('clash_interaction_seconds', action='remove')
     async def remove_button(self, interaction: discord.Interaction, button: Button):
-        user_id = str(interaction.user.id)
+        user_id = interaction.user.id
+        day_key = 'saturday' if self.day == "Saturday" else 'sunday'
+        roster = getattr(self.parent_view.state, day_key)
         removed = False
-        if self.day == "Saturday" and user_id in self.parent_view.state['saturday']:
-            del self.parent_view.state['saturday'][user_id]
-            removed = True
-        elif self.day == "Sunday" and user_id in self.parent_view.state['sunday']:
-            del self.parent_view.state['sunday'][user_id]
+        if user_id in roster:
+            ROSTERS.remove(self.parent_view.guild_id, day_key, user_id, roster)
             removed = True
 
         if removed:
             self.parent_view.save_current_state()
-            new_embed = self.parent_view.update_embed(self.main_message.embeds[0])
-            await self.main_message.edit(embed=new_embed)
             await interaction.response.edit_message(content=f"🗑️ Removed from {self.day}.", view=self)
+            EMBED_EDITS.schedule(self.main_message, self.parent_view)
         else:
             await interaction.response.edit_message(content=f"You weren't signed up for {self.day}.", view=self)
 
 class RSVPView(View):
-    def __init__(self, guild_id):
+    """
+    Sign-up buttons under an announcement. Bound to a guild when posting; the unbound instance
+    registered at startup handles clicks for every guild.
+    """
+    def __init__(self, guild_id=None):
         super().__init__(timeout=None)
-        self.guild_id = str(guild_id)
+        self.guild_id = str(guild_id) if guild_id is not None else None
+
+    async def for_interaction(self, interaction):
+        """Returns the view bound to the clicked guild, or None if the message is no longer live."""
+        view = self if self.guild_id else RSVPView(interaction.guild_id)
+        if view.state.message_id != interaction.message.id:
+            await interaction.response.send_message("This sign-up has closed. Use the latest Clash announcement.", ephemeral=True)
+            return None
+        return view
 
     @property
     def state(self):
-        if self.guild_id not in CLASH_STATE['guilds']:
-            CLASH_STATE['guilds'][self.guild_id] = {
-                'channel_id': None, 
-                'message_id': None, 
-                'tournament_id': None,
-                'saturday': {}, 
-                'sunday': {}
-            }
-        return CLASH_STATE['guilds'][self.guild_id]
+        return guild_record(self.guild_id)
 
     def save_current_state(self):
-        save_state(CLASH_STATE)
+        save_state(CLASH_STATE, [self.guild_id])
 
+    @METRICS.timed('clash_update_embed_seconds', help_text="Roster embed render time")
     def update_embed(self, original_embed):
-        def format_list(user_dict):
-            if not user_dict: return "No one yet."
-            lines = []
-            for uid, roles in user_dict.items():
-                lines.append(f"<@{uid}> *({roles})*")
-            return "\n".join(lines)
-
-        sat_str = format_list(self.state['saturday'])
-        sun_str = format_list(self.state['sunday'])
-        original_embed.set_field_at(1, name=f"🛰️ Saturday ({len(self.state['saturday'])})", value=sat_str, inline=True)
-        original_embed.set_field_at(2, name=f"🌞 Sunday ({len(self.state['sunday'])})", value=sun_str, inline=True)
-        return original_embed
+        return ROSTERS.render(self.guild_id, self.state, original_embed)
 
     @discord.ui.button(label="🛰️ Saturday", style=discord.ButtonStyle.blurple, custom_id="rsvp_saturday")
     async def saturday_button(self, interaction: discord.Interaction, button: Button):
-        view = EphemeralRSVPView("Saturday", self, interaction.message)
+        parent = await self.for_interaction(interaction)
+        if parent is None: return
+        view = EphemeralRSVPView("Saturday", parent, interaction.message)
         await interaction.response.send_message("Select your roles for **Saturday**:", view=view, ephemeral=True)
 
     @discord.ui.button(label="🌞 Sunday", style=discord.ButtonStyle.blurple, custom_id="rsvp_sunday")
     async def sunday_button(self, interaction: discord.Interaction, button: Button):
-        view = EphemeralRSVPView("Sunday", self, interaction.message)
+        parent = await self.for_interaction(interaction)
+        if parent is None: return
+        view = EphemeralRSVPView("Sunday", parent, interaction.message)
         await interaction.response.send_message("Select your roles for **Sunday**:", view=view, ephemeral=True)
 
 # --- ADMIN APPROVAL VIEW ---
-class AdminApprovalView(View):
-    def __init__(self, composite_id, embed, related_ids):
-        super().__init__(timeout=None)
-        self.composite_id = composite_id
-        self.embed = embed
-        self.related_ids = related_ids
+class ApprovalButton(discord.ui.DynamicItem[Button], template=r'clash:(?P<action>approve|reject):(?P<event_id>[\w:]+)'):
+    """Approve/Reject button on the admin DM; the event id travels in the custom_id."""
+    def __init__(self, action, event_id):
+        if action == 'approve':
+            button = Button(label="✅ Approve Broadcast", style=discord.ButtonStyle.green, custom_id=f"clash:approve:{event_id}")
+        else:
+            button = Button(label="❌ Reject / Ignore", style=discord.ButtonStyle.red, custom_id=f"clash:reject:{event_id}")
+        super().__init__(button)
+        self.action = action
+        self.composite_id = event_id
 
-    @discord.ui.button(label="✅ Approve Broadcast", style=discord.ButtonStyle.green)
-    async def approve(self, interaction: discord.Interaction, button: Button):
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match['action'], match['event_id'])
+
+    async def callback(self, interaction: discord.Interaction):
         if interaction.user.id != ADMIN_USER_ID: return
+        if self.action == 'approve':
+            await self.approve(interaction)
+        else:
+            await self.reject(interaction)
+
+    async def approve(self, interaction):
+        # Another process may have recorded the pending event or its payload.
+        if SHARDED:
+            await STATE_WRITER.refresh(CLASH_STATE)
 
         # Update State
-        if self.composite_id not in CLASH_STATE['approved_ids']:
-            CLASH_STATE['approved_ids'].append(self.composite_id)
-        
-        if self.composite_id in CLASH_STATE['pending_ids']:
-            CLASH_STATE['pending_ids'].remove(self.composite_id)
-            
-        save_state(CLASH_STATE)
+        ends_at = CLASH_STATE['pending_ids'].pop(self.composite_id, None) or CLASH_STATE['approved_ids'].get(self.composite_id)
+        CLASH_STATE['approved_ids'][self.composite_id] = ends_at or int(now_ms() + GUARD_WINDOW_MS)
+        save_state(CLASH_STATE, ())
 
         await interaction.response.edit_message(content=f"✅ **Approved!** Broadcasting to all servers...", view=None)
         print(f"Admin approved event {self.composite_id}. Starting broadcast...")
-        
+
         # Trigger Broadcast
-        await broadcast_to_guilds(self.composite_id, self.embed, self.related_ids)
+        announcement = CLASH_STATE['announcements'].get(self.composite_id)
+        embed = discord.Embed.from_dict(announcement['embed']) if announcement else interaction.message.embeds[0]
+        await announce_event(self.composite_id, embed, split_event_id(self.composite_id)[1])
 
-    @discord.ui.button(label="❌ Reject / Ignore", style=discord.ButtonStyle.red)
-    async def reject(self, interaction: discord.Interaction, button: Button):
-        if interaction.user.id != ADMIN_USER_ID: return
-        
+    async def reject(self, interaction):
         # We don't verify rejection, just leave it pending or ignore
         await interaction.response.edit_message(content=f"❌ **Rejected.** I will not broadcast this event.", view=None)
         print(f"Admin rejected event {self.composite_id}.")
 
-# --- BOT EVENTS ---
-@bot.event
-async def on_ready():
-    print(f'Logged in as {bot.user} (ID: {bot.user.id})')
-    global CLASH_STATE
-    CLASH_STATE = load_state()
+class AdminApprovalView(View):
+    def __init__(self, composite_id):
+        super().__init__(timeout=None)
+        self.add_item(ApprovalButton('approve', composite_id))
+        self.add_item(ApprovalButton('reject', composite_id))
 
-    print("Restoring views...")
-    for guild_id, data in CLASH_STATE['guilds'].items():
-        if data.get('message_id'):
-            view = RSVPView(guild_id)
-            bot.add_view(view, message_id=data['message_id'])
+# --- BOT EVENTS ---
+def command_tree_hash():
+    """Hash of the slash command definitions as Discord would receive them."""
+    return content_hash({
+        'application_id': bot.application_id,
+        'commands': [command.to_dict(bot.tree) for command in bot.tree.get_commands()],
+    })
+
+async def sync_commands_if_changed():
+    """Global syncs are slow and heavily rate limited, so only sync when the definitions changed."""
+    digest = command_tree_hash()
+    if CLASH_STATE['commands'].get('hash') == digest:
+        print("Command definitions unchanged, skipping sync.")
+        return
 
     try:
         synced = await bot.tree.sync()
         print(f"Synced {len(synced)} command(s)")
     except Exception as e:
         print(f"Failed to sync commands: {e}")
+        return
+    CLASH_STATE['commands']['hash'] = digest
+    save_state(CLASH_STATE, ())
 
-    if not check_clash_schedule.is_running():
-        check_clash_schedule.start()
+@bot.event
+async def on_ready():
+    # State, views and commands are set up once in setup_hook; reconnects only land here.
+    print(f'Logged in as {bot.user} (ID: {bot.user.id})')
+
+    global SCHEDULER_TASK, SHARD_SYNC_TASK, OUTBOX_TASK, REMINDER_TASK
+    if OUTBOX_TASK is None or OUTBOX_TASK.done():
+        OUTBOX_TASK = asyncio.ensure_future(outbox_loop())
+    if REMINDER_TASK is None or REMINDER_TASK.done():
+        REMINDER_TASK = asyncio.ensure_future(reminder_loop())
+    if SHARDED:
+        if SHARD_SYNC_TASK is None or SHARD_SYNC_TASK.done():
+            SHARD_SYNC_TASK = asyncio.ensure_future(shard_sync_loop())
+    elif SCHEDULER_TASK is None or SCHEDULER_TASK.done():
+        SCHEDULER_TASK = asyncio.ensure_future(clash_scheduler())
+
+    # Last, so a metrics endpoint that can't start never holds up polling and delivery.
+    await start_metrics_server()
 
 @bot.tree.command(name="setclashchannel", description="Set the current channel for Clash announcements")
 async def set_clash_channel(interaction: discord.Interaction):
@@ -251,14 +1607,10 @@ async def set_clash_channel(interaction: discord.Interaction):
         return
 
     guild_id = str(interaction.guild_id)
-    if guild_id not in CLASH_STATE['guilds']:
-        CLASH_STATE['guilds'][guild_id] = {
-            'saturday': {}, 'sunday': {}, 
-            'tournament_id': None, 'message_id': None
-        }
-    
-    CLASH_STATE['guilds'][guild_id]['channel_id'] = interaction.channel_id
-    save_state(CLASH_STATE)
+    guild_record(guild_id).channel_id = interaction.channel_id
+    guild_record(guild_id).outbox_dropped_id = None
+    save_state(CLASH_STATE, [guild_id])
+    request_redelivery(guild_region(guild_record(guild_id)))
     await interaction.response.send_message(f"✅ Clash announcements will now be posted in <#{interaction.channel_id}>.")
 
 @bot.tree.command(name="checkclash", description="Manually check for upcoming Clash tournaments")
@@ -267,71 +1619,141 @@ async def checkclash(interaction: discord.Interaction):
         await interaction.response.send_message("You need Administrator permissions to use this.", ephemeral=True)
         return
 
+    if not IS_LEADER:
+        # This shard's guilds are covered by its own fan-out; make it run again.
+        request_redelivery()
+        await interaction.response.send_message("Clash checks run on the leader shard; re-delivering the current announcement to this shard's servers.", ephemeral=True)
+        return
+
     await interaction.response.send_message(f"Checking API and pending approvals...")
-    await core_clash_check()
+    # Manual checks always walk the guilds, even if the schedule hasn't changed.
+    await core_clash_check(force=True)
 
 @bot.tree.command(name="listtournaments", description="List tournaments from the Riot API")
 async def list_tournaments(interaction: discord.Interaction):
     if interaction.user.id == ADMIN_USER_ID:
-        await interaction.response.send_message(str(get_upcoming_clash_tournaments())[:2000], ephemeral=True)
+        await interaction.response.defer(ephemeral=True)
+        schedules = await fetch_clash_schedules()
+        await interaction.followup.send(str(schedules)[:2000], ephemeral=True)
     else:
         await interaction.response.send_message("Restricted command.", ephemeral=True)
 
-@tasks.loop(hours=24)
-async def check_clash_schedule():
-    await core_clash_check()
-
-@check_clash_schedule.before_loop
-async def before_check():
-    await bot.wait_until_ready()
-    now = datetime.datetime.now(datetime.timezone.utc)
-    target_time = now.replace(hour=22, minute=0, second=0, microsecond=0)
-    if now > target_time:
-        target_time += datetime.timedelta(days=1)
-    delay_seconds = (target_time - now).total_seconds()
-    print(f"Scheduling first automatic check in {delay_seconds/3600:.2f} hours (at {target_time.strftime('%H:%M UTC')})...")
-    await asyncio.sleep(delay_seconds)
-
-async def core_clash_check(target_guild_id=None):
-    print("Checking for Clash tournaments...")
-    tournaments = get_upcoming_clash_tournaments()
-
-    if not tournaments:
-        CLASH_STATE['days'] = []
-        save_state(CLASH_STATE)
+@bot.tree.command(name="buildteams", description="Split the Clash sign-ups into full 5-player teams")
+@app_commands.describe(day="Which day to build teams for (default: both)")
+@app_commands.choices(day=[app_commands.Choice(name=label, value=day) for day, label in ROSTER_DAYS])
+async def build_teams_command(interaction: discord.Interaction, day: app_commands.Choice[str] = None):
+    guild_data = CLASH_STATE['guilds'].get(str(interaction.guild_id))
+    if not guild_data or not (guild_data.saturday or guild_data.sunday):
+        await interaction.response.send_message("No one has signed up yet.", ephemeral=True)
         return
 
-    # If the first tournament in the list is Day 2, Day 1 has already passed.
-    # We skip to prevent a new announcement from triggering on Sunday.
-    if tournaments[0].get('secondary_name', '').lower() == 'day 2':
-        print("API only shows Day 2 remaining. Skipping to prevent Sunday duplicate announcements.")
+    days = [day.value] if day else [d for d, _ in ROSTER_DAYS]
+    await interaction.response.send_message(embed=build_teams_embed(guild_data, days))
+
+@bot.tree.command(name="clashreminders", description="Remind signed-up players shortly before Clash lock-in opens")
+@app_commands.describe(mode="How to remind the day's signups")
+@app_commands.choices(mode=[
+    app_commands.Choice(name="Mention them in the announcement channel", value="channel"),
+    app_commands.Choice(name="Direct message each player", value="dm"),
+    app_commands.Choice(name="Off", value="off"),
+])
+async def clash_reminders(interaction: discord.Interaction, mode: app_commands.Choice[str]):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("You need Administrator permissions to use this.", ephemeral=True)
         return
 
-    # --- 10-DAY LIMIT GUARD CLAUSE ---
-    current_time_ms = datetime.datetime.now().timestamp() * 1000
-    time_until_reg = tournaments[0]['registrationTime'] - current_time_ms
-    if time_until_reg > (10 * 24 * 60 * 60 * 1000):
-        print(f"Tournament is {time_until_reg / (24 * 60 * 60 * 1000):.1f} days away (limit 10). Skipping for now.")
-        return
+    guild_id = str(interaction.guild_id)
+    guild_record(guild_id).reminder_mode = mode.value
+    save_state(CLASH_STATE, [guild_id])
+    schedule_guild_reminders(guild_id)
+    if mode.value == 'off':
+        await interaction.response.send_message("🔕 Lock-in reminders are off.")
+    else:
+        await interaction.response.send_message(
+            f"⏰ Signups will be reminded {REMINDER_LEAD_MINUTES:g} minutes before lock-in opens ({mode.name.lower()}).")
 
-    # Update 'days' list so we track what we've seen, but don't stop execution
-    for t in tournaments:
-        if t['id'] not in CLASH_STATE['days']:
-            CLASH_STATE['days'].append(t['id'])
+@bot.tree.command(name="setclashregion", description="Set which Riot region's Clash tournaments this server follows")
+@app_commands.describe(region="Riot platform region")
+@app_commands.choices(region=[app_commands.Choice(name=r.upper(), value=r) for r in RIOT_REGIONS[:25]])
+async def set_clash_region(interaction: discord.Interaction, region: app_commands.Choice[str]):
+    if not interaction.user.guild_permissions.administrator:
+        await interaction.response.send_message("You need Administrator permissions to use this.", ephemeral=True)
+        return
 
-    # 1. Determine Window
-    next_tournament = tournaments[0]
-    first_start_time = next_tournament['startTime']
-    cutoff_time = first_start_time + (7 * 24 * 60 * 60 * 1000)
+    guild_id = str(interaction.guild_id)
+    guild_record(guild_id).region = region.value
+    save_state(CLASH_STATE, [guild_id])
+    # The next poll of that region must walk the guilds again to post here.
+    request_redelivery(region.value)
+    await interaction.response.send_message(f"✅ This server will now receive **{region.name}** Clash announcements.")
+
+# --- ADAPTIVE POLLING ---
+# Last successful schedule per region, used to decide when to poll next.
+SCHEDULE_CACHE = {}
+# content_hash of the last schedule per region that was fully acted on; an identical poll is a no-op.
+SCHEDULE_FINGERPRINTS = {}
+SCHEDULER_TASK = None
+SCHEDULER_WAKE = asyncio.Event()
+
+def next_poll_delay(schedules, current_ms, failed=False):
+    """
+    Seconds until the next Riot poll. Polls often close to registration/start, rarely when
+    nothing is scheduled, and always wakes just after the guard window opens or a day begins.
+    """
+    upcoming = [d for days in schedules.values() for d in days if d['startTime'] > current_ms]
+    delay = POLL_WATCH_INTERVAL if upcoming else POLL_IDLE_INTERVAL
+    if failed:
+        delay = min(delay, POLL_RETRY_INTERVAL)
+
+    for day in upcoming:
+        until_reg = (day['registrationTime'] - current_ms) / 1000
+        until_start = (day['startTime'] - current_ms) / 1000
+        if until_reg <= GUARD_WINDOW_MS / 1000:
+            delay = min(delay, POLL_NEAR_INTERVAL)
+        if until_reg <= 48 * 3600 or until_start <= 48 * 3600:
+            delay = min(delay, POLL_HOT_INTERVAL)
+        for milestone in (until_reg - GUARD_WINDOW_MS / 1000, until_reg, until_start):
+            if milestone > 0:
+                delay = min(delay, milestone + POLL_MIN_INTERVAL)
+
+    return max(POLL_MIN_INTERVAL, delay)
+
+def schedule_next_poll(failed=False):
+    """Persists the next run time derived from SCHEDULE_CACHE and wakes the scheduler to pick it up."""
+    current_ms = now_ms()
+    delay = next_poll_delay(SCHEDULE_CACHE, current_ms, failed)
+    CLASH_STATE['scheduler']['next_run'] = int(current_ms + delay * 1000)
+    save_state(CLASH_STATE, ())
+    SCHEDULER_WAKE.set()
+    print(f"Next Clash check in {delay / 3600:.2f} hours.")
+
+async def clash_scheduler():
+    await bot.wait_until_ready()
+    while not bot.is_closed():
+        # With no saved run, or one missed while offline, poll shortly after start rather than on connect.
+        next_run = CLASH_STATE['scheduler'].get('next_run')
+        delay = POLL_MIN_INTERVAL
+        if next_run is not None:
+            delay = max(delay, (next_run - now_ms()) / 1000)
+
+        SCHEDULER_WAKE.clear()
+        try:
+            await asyncio.wait_for(SCHEDULER_WAKE.wait(), timeout=delay)
+            continue  # rescheduled by a manual check, recompute
+        except asyncio.TimeoutError:
+            pass
 
-    # 2. Find Related Days
-    related_days = [t for t in tournaments if t['startTime'] <= cutoff_time]
-    related_ids = sorted([str(t['tournament_id']) for t in related_days])
-    composite_id = "_".join(related_ids)
+        try:
+            await core_clash_check()
+        except Exception as e:
+            print(f"Scheduled Clash check failed: {e}")
+            schedule_next_poll(failed=True)
 
-    print(f"Current Event ID: {composite_id}")
+# Minutes after registrationTime at which the Tier IV, III, II and I lock-in windows open.
+LOCK_IN_TIER_OFFSETS = (0, 45, 90, 120)
 
-    # --- Generate Content ---
+def build_announcement_embed(related_days):
+    """Builds the announcement embed (schedule plus empty rosters) for one event's days."""
     display_dates = []
     seen_dates = set()
     for day in related_days:
@@ -342,12 +1764,10 @@ async def core_clash_check(target_guild_id=None):
             display_dates.append(date_tag)
     dates_str = " & ".join(display_dates)
 
+    next_tournament = related_days[0]
     reg_timestamp = int(next_tournament['registrationTime'] / 1000)
     start_timestamp = int(next_tournament['startTime'] / 1000)
-    t4_ts = reg_timestamp
-    t3_ts = reg_timestamp + (45 * 60)
-    t2_ts = reg_timestamp + (90 * 60)
-    t1_ts = reg_timestamp + (120 * 60)
+    t4_ts, t3_ts, t2_ts, t1_ts = (reg_timestamp + offset * 60 for offset in LOCK_IN_TIER_OFFSETS)
 
     time_schedule = (
         f"**Tier IV:** <t:{t4_ts}:t>\n"
@@ -366,11 +1786,83 @@ async def core_clash_check(target_guild_id=None):
     base_embed.add_field(name="🛰️ Saturday (0)", value="No one yet.", inline=True)
     base_embed.add_field(name="🌞 Sunday (0)", value="No one yet.", inline=True)
     base_embed.set_thumbnail(url="https://raw.communitydragon.org/latest/plugins/rcp-fe-lol-clash/global/default/assets/images/trophy.png")
+    return base_embed
+
+async def core_clash_check(target_guild_id=None, force=False):
+    print("Checking for Clash tournaments...")
+    regions = RIOT_REGIONS
+    if target_guild_id:
+        regions = [guild_region(CLASH_STATE['guilds'].get(str(target_guild_id)))]
+    schedules = await fetch_clash_schedules(regions)
+    SCHEDULE_CACHE.update({r: t for r, t in schedules.items() if t is not None})
+
+    if prune_event_indexes(CLASH_STATE):
+        save_state(CLASH_STATE, ())
+
+    for region, tournaments in schedules.items():
+        await check_region(region, tournaments, target_guild_id, force)
+
+    schedule_next_poll(failed=any(t is None for t in schedules.values()))
+
+async def check_region(region, tournaments, target_guild_id=None, force=False):
+    if tournaments is None:
+        # Fetch failed; keep what we know and retry on the next poll.
+        return
+
+    # Same schedule as the last check that announced it: nothing to detect, announce or edit.
+    fingerprint = content_hash(tournaments)
+    if not target_guild_id and not force and SCHEDULE_FINGERPRINTS.get(region) == fingerprint:
+        print(f"[{region}] Schedule unchanged since the last check.")
+        return
+
+    if not tournaments:
+        for day_key in [k for k in CLASH_STATE['days'] if k.startswith(f"{region}:")]:
+            del CLASH_STATE['days'][day_key]
+        save_state(CLASH_STATE, ())
+        SCHEDULE_FINGERPRINTS[region] = fingerprint
+        return
+
+    # If the first tournament in the list is Day 2, Day 1 has already passed.
+    # We skip to prevent a new announcement from triggering on Sunday.
+    if tournaments[0].get('secondary_name', '').lower() == 'day 2':
+        print(f"[{region}] API only shows Day 2 remaining. Skipping to prevent Sunday duplicate announcements.")
+        SCHEDULE_FINGERPRINTS[region] = fingerprint
+        return
+
+    # --- 10-DAY LIMIT GUARD CLAUSE ---
+    current_time_ms = now_ms()
+    time_until_reg = tournaments[0]['registrationTime'] - current_time_ms
+    if time_until_reg > GUARD_WINDOW_MS:
+        print(f"[{region}] Tournament is {time_until_reg / (24 * 60 * 60 * 1000):.1f} days away (limit 10). Skipping for now.")
+        return
+
+    # Update 'days' index so we track what we've seen, but don't stop execution
+    for t in tournaments:
+        CLASH_STATE['days'][f"{region}:{t['id']}"] = t['startTime'] + CLASH_DAY_LENGTH_MS
+
+    # 1. Determine Window
+    next_tournament = tournaments[0]
+    first_start_time = next_tournament['startTime']
+    cutoff_time = first_start_time + (7 * 24 * 60 * 60 * 1000)
+
+    # 2. Find Related Days
+    related_days = [t for t in tournaments if t['startTime'] <= cutoff_time]
+    related_ids = sorted([str(t['tournament_id']) for t in related_days])
+    composite_id = make_event_id(region, related_ids)
+    event_ends_at = max(t['startTime'] for t in related_days) + CLASH_DAY_LENGTH_MS
+
+    print(f"Current Event ID: {composite_id}")
+
+    base_embed = build_announcement_embed(related_days)
+    lock_ins = sorted(t['registrationTime'] for t in related_days)
 
     # --- APPROVAL LOGIC ---
     if composite_id in CLASH_STATE['approved_ids']:
         # Already approved? Just verify broadcast to guilds (update logic)
-        await broadcast_to_guilds(composite_id, base_embed, related_ids, target_guild_id)
+        report = await announce_event(composite_id, base_embed, related_ids, target_guild_id, lock_ins)
+        # Guilds that failed get another go on the next poll.
+        if not target_guild_id and (report is None or not report.outcomes['failed']):
+            SCHEDULE_FINGERPRINTS[region] = fingerprint
     elif composite_id in CLASH_STATE['pending_ids']:
         print(f"Event {composite_id} is pending admin approval.")
     else:
@@ -378,104 +1870,728 @@ async def core_clash_check(target_guild_id=None):
         print(f"New Event {composite_id} detected. Sending DM to Admin...")
         try:
             admin_user = await bot.fetch_user(ADMIN_USER_ID)
-            view = AdminApprovalView(composite_id, base_embed, related_ids)
+            view = AdminApprovalView(composite_id)
             await admin_user.send(
-                content="🚨 **New Clash Tournament Detected!**\nPlease review the data below. If it looks correct, click Approve to broadcast to all servers.",
+                content=f"🚨 **New Clash Tournament Detected!** ({region.upper()})\nPlease review the data below. If it looks correct, click Approve to broadcast to all servers.",
                 embed=base_embed,
                 view=view
             )
-            CLASH_STATE['pending_ids'].append(composite_id)
-            save_state(CLASH_STATE)
+            CLASH_STATE['pending_ids'][composite_id] = event_ends_at
+            publish_announcement(composite_id, base_embed, related_ids, lock_ins)
+            save_state(CLASH_STATE, ())
         except Exception as e:
             print(f"Failed to DM Admin: {e}")
 
+def publish_announcement(composite_id, base_embed, related_ids, lock_ins=None):
+    """
+    Stores the event's embed so any process (or shard) can broadcast it. Returns True if it changed.
+    lock_ins are the registrationTimes of its days in order (Saturday first); kept if not given.
+    """
+    embed_dict = base_embed.to_dict()
+    current = CLASH_STATE['announcements'].get(composite_id)
+    if lock_ins is None:
+        lock_ins = current.get('lock_ins', []) if current else []
+    if (current and current['embed'] == embed_dict and current['related_ids'] == list(related_ids)
+            and current.get('lock_ins') == list(lock_ins)):
+        return False
+    CLASH_STATE['announcements'][composite_id] = {
+        'embed': embed_dict,
+        'related_ids': list(related_ids),
+        'lock_ins': list(lock_ins),
+        'updated_at': int(now_ms()),
+    }
+    return True
+
+async def announce_event(composite_id, base_embed, related_ids, target_guild_id=None, lock_ins=None):
+    """
+    Delivers an approved event. Unsharded, this broadcasts directly and returns the BroadcastReport;
+    sharded, the announcement is published to the shared store and every shard process fans it out
+    to its own guilds (returns None).
+    """
+    if publish_announcement(composite_id, base_embed, related_ids, lock_ins):
+        save_state(CLASH_STATE, ())
+    if SHARDED and not target_guild_id:
+        await STATE_WRITER.flush()
+        SHARD_SYNC_WAKE.set()
+        return None
+    return await broadcast_to_guilds(composite_id, base_embed, related_ids, target_guild_id)
+
+# --- SHARDING ---
+SHARD_SYNC_TASK = None
+SHARD_SYNC_WAKE = asyncio.Event()
+IS_LEADER = not SHARDED
+# event id -> announcement 'updated_at' this process last fanned out.
+DELIVERED_ANNOUNCEMENTS = {}
+
+def set_leader(leader):
+    """Only the leader detects tournaments and DMs the admin, so it alone runs the scheduler."""
+    global IS_LEADER, SCHEDULER_TASK
+    if leader and not IS_LEADER:
+        print(f"{INSTANCE_ID} is now the leader.")
+    elif IS_LEADER and not leader:
+        print(f"{INSTANCE_ID} lost leadership.")
+    IS_LEADER = leader
+    if leader and (SCHEDULER_TASK is None or SCHEDULER_TASK.done()):
+        SCHEDULER_TASK = asyncio.ensure_future(clash_scheduler())
+    elif not leader and SCHEDULER_TASK is not None:
+        SCHEDULER_TASK.cancel()
+        SCHEDULER_TASK = None
+
+def request_redelivery(region=None):
+    """
+    Guilds changed (joined, new channel or region): make the next check of `region`
+    (all regions if None) walk the guilds again, and the next shard sync fan out again.
+    """
+    if region is None:
+        SCHEDULE_FINGERPRINTS.clear()
+    else:
+        SCHEDULE_FINGERPRINTS.pop(region, None)
+    DELIVERED_ANNOUNCEMENTS.clear()
+    if SHARDED:
+        SHARD_SYNC_WAKE.set()
+
+def current_announcements():
+    """The newest approved announcement per region; older approved events must not be re-posted."""
+    latest = {}
+    for event_id, announcement in CLASH_STATE['announcements'].items():
+        if event_id not in CLASH_STATE['approved_ids']: continue
+        region, _ = split_event_id(event_id)
+        newest_day = max(announcement.get('lock_ins') or [0])
+        if region not in latest or newest_day >= latest[region][0]:
+            latest[region] = (newest_day, event_id, announcement)
+    return [(event_id, announcement) for _, event_id, announcement in latest.values()]
+
+async def fan_out_announcements():
+    """Broadcasts each region's current announcement to this process's guilds, if not done since it changed."""
+    for event_id, announcement in current_announcements():
+        if DELIVERED_ANNOUNCEMENTS.get(event_id) == announcement['updated_at']: continue
+        DELIVERED_ANNOUNCEMENTS[event_id] = announcement['updated_at']
+        embed = discord.Embed.from_dict(announcement['embed'])
+        await broadcast_to_guilds(event_id, embed, announcement['related_ids'])
+
+async def shard_sync_loop():
+    """Sharded mode: refresh shared state, hold or contest the leader lease, fan out approvals."""
+    await bot.wait_until_ready()
+    while not bot.is_closed():
+        try:
+            await STATE_WRITER.refresh(CLASH_STATE)
+            leader = await STATE_WRITER.call_backend(STATE_STORE.acquire_lease, 'leader', INSTANCE_ID, LEADER_LEASE_SECONDS)
+            set_leader(leader)
+            await fan_out_announcements()
+        except Exception as e:
+            print(f"Shard sync failed: {e}")
+
+        SHARD_SYNC_WAKE.clear()
+        try:
+            await asyncio.wait_for(SHARD_SYNC_WAKE.wait(), timeout=SHARD_SYNC_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+# --- ANNOUNCEMENT CHANNEL RESOLUTION ---
+# guild id -> fallback channel id (None = no usable channel), for guilds without /setclashchannel.
+# Filled lazily, persisted as 'resolved_channel_id', dropped by the channel/role/member events below.
+RESOLVED_CHANNELS = {}
+
+def find_announcement_channel(guild):
+    """Scans the guild for a channel the bot can post in."""
+    if guild.system_channel and guild.system_channel.permissions_for(guild.me).send_messages:
+        return guild.system_channel
+    fallback = None
+    for c in guild.text_channels:
+        if not c.permissions_for(guild.me).send_messages:
+            continue
+        if c.name in ['general', 'clash', 'league', 'announcements']:
+            return c
+        if fallback is None:
+            fallback = c
+    return fallback
+
+def resolve_announcement_channel(guild, guild_data):
+    """Returns the configured channel, else the cached fallback, scanning the guild only on a miss."""
+    channel_id = guild_data.channel_id
+    if channel_id:
+        channel = bot.get_channel(channel_id)
+        if channel: return channel
+
+    guild_id = str(guild.id)
+    if guild_id not in RESOLVED_CHANNELS and guild_data.resolved_channel_id:
+        RESOLVED_CHANNELS[guild_id] = guild_data.resolved_channel_id
+
+    if guild_id in RESOLVED_CHANNELS:
+        resolved_id = RESOLVED_CHANNELS[guild_id]
+        if resolved_id is None:
+            return None
+        channel = guild.get_channel(resolved_id)
+        if channel: return channel
+
+    channel = find_announcement_channel(guild)
+    RESOLVED_CHANNELS[guild_id] = channel.id if channel else None
+    guild_data.resolved_channel_id = channel.id if channel else None
+    return channel
+
+def invalidate_announcement_channel(guild):
+    guild_id = str(guild.id)
+    RESOLVED_CHANNELS.pop(guild_id, None)
+    guild_data = CLASH_STATE['guilds'].get(guild_id)
+    if guild_data and (guild_data.resolved_channel_id or guild_data.outbox_dropped_id):
+        guild_data.resolved_channel_id = None
+        # A delivery given up on may succeed now.
+        guild_data.outbox_dropped_id = None
+        save_state(CLASH_STATE, [guild_id])
+    # A guild that had no usable channel (or permission) may be reachable now; an unchanged
+    # schedule must not skip it on the next poll.
+    region = guild_region(guild_data)
+    current = {split_event_id(event_id)[0]: event_id for event_id, _ in current_announcements()}
+    if region in current and (guild_data is None or guild_data.tournament_id != current[region]):
+        request_redelivery(region)
+
+@bot.event
+async def on_guild_channel_create(channel):
+    invalidate_announcement_channel(channel.guild)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    invalidate_announcement_channel(channel.guild)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    invalidate_announcement_channel(after.guild)
+
+@bot.event
+async def on_guild_role_create(role):
+    invalidate_announcement_channel(role.guild)
+
+@bot.event
+async def on_guild_role_delete(role):
+    invalidate_announcement_channel(role.guild)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    invalidate_announcement_channel(after.guild)
+
+@bot.event
+async def on_member_update(before, after):
+    # Only delivered with the members intent; role events above cover the common case.
+    if bot.user and after.id == bot.user.id:
+        invalidate_announcement_channel(after.guild)
+
+@bot.event
+async def on_guild_remove(guild):
+    RESOLVED_CHANNELS.pop(str(guild.id), None)
+
+@bot.event
+async def on_guild_join(guild):
+    # The new guild needs the current announcement, so the next poll can't be skipped.
+    request_redelivery()
+
+# --- BROADCAST ---
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list (0 for an empty one)."""
+    if not values: return 0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+class BroadcastReport:
+    """Per-guild outcomes and latencies for one broadcast."""
+    OUTCOMES = ('posted', 'updated', 'skipped', 'forbidden', 'not_found', 'failed')
+
+    def __init__(self):
+        self.outcomes = {outcome: 0 for outcome in self.OUTCOMES}
+        self.latencies = []
+        self.wall_time = 0
+
+    def record(self, outcome, latency):
+        self.outcomes[outcome] += 1
+        self.latencies.append(latency)
+
+    def summary(self):
+        counts = ", ".join(f"{k}={v}" for k, v in self.outcomes.items())
+        return (f"{counts} | wall {self.wall_time:.2f}s, "
+                f"p50 {percentile(self.latencies, 50) * 1000:.0f}ms, p99 {percentile(self.latencies, 99) * 1000:.0f}ms")
+
 async def broadcast_to_guilds(composite_id, base_embed, related_ids, target_guild_id=None):
     """
     Broadcasts the approved tournament to all guilds or a specific target.
+    Every guild that needs the announcement first gets a delivery job in the outbox, flushed to
+    disk with its guild record, so a restart mid-broadcast resumes where it stopped.
     """
     print(f"Broadcasting event {composite_id}...")
+    region, _ = split_event_id(composite_id)
     
     guilds_to_process = []
     if target_guild_id:
         g = bot.get_guild(int(target_guild_id))
         if g: guilds_to_process.append(g)
     else:
-        guilds_to_process = bot.guilds
+        guilds_to_process = list(bot.guilds)
+    # Each region's event only goes to the guilds that follow that region.
+    guilds_to_process = [g for g in guilds_to_process if guild_region(CLASH_STATE['guilds'].get(str(g.id))) == region]
 
+    # Resumed jobs rebuild the embed from the stored announcement.
+    if publish_announcement(composite_id, base_embed, related_ids):
+        save_state(CLASH_STATE, ())
+
+    report = BroadcastReport()
+    announcement_hash = content_hash(base_embed.to_dict())
+    jobs = []
     for guild in guilds_to_process:
-        guild_id = str(guild.id)
-
-        # Ensure guild entry exists in state
-        if guild_id not in CLASH_STATE['guilds']:
-            CLASH_STATE['guilds'][guild_id] = {
-                'channel_id': None, 'message_id': None, 
-                'tournament_id': None, 'saturday': {}, 'sunday': {}
-            }
-
-        guild_data = CLASH_STATE['guilds'][guild_id]
-        channel_id = guild_data.get('channel_id')
-        channel = None
-
-        if channel_id:
-            channel = bot.get_channel(channel_id)
-
-        # Fallback detection
-        if not channel:
-            if guild.system_channel and guild.system_channel.permissions_for(guild.me).send_messages:
-                channel = guild.system_channel
-            else:
-                for c in guild.text_channels:
-                    if c.name in ['general', 'clash', 'league', 'announcements'] and c.permissions_for(guild.me).send_messages:
-                        channel = c
-                        break
-                if not channel:
-                    for c in guild.text_channels:
-                        if c.permissions_for(guild.me).send_messages:
-                            channel = c
-                            break
-
-        if not channel:
-            print(f"No suitable channel found for guild {guild.name} ({guild_id}). Skipping.")
+        record = guild_record(guild.id)
+        if not target_guild_id and (already_delivered(record, composite_id, announcement_hash)
+                                    or record.outbox_dropped_id == composite_id):
+            report.outcomes['skipped'] += 1
             continue
+        enqueue_delivery(guild.id, composite_id)
+        jobs.append(guild)
+    if jobs:
+        save_state(CLASH_STATE, [str(g.id) for g in jobs])
+        await STATE_WRITER.flush()
+
+    await deliver_jobs(jobs, composite_id, base_embed, related_ids, report, target_guild_id, announcement_hash)
+    print(f"Broadcast of {composite_id} finished: {report.summary()}")
+    return report
+
+async def deliver_jobs(guilds, composite_id, base_embed, related_ids, report, target_guild_id=None, announcement_hash=None):
+    """
+    Runs the outbox jobs of `guilds` for one event on BROADCAST_WORKERS concurrent workers.
+    discord.py already waits on per-route buckets (each guild's channel is its own route);
+    DISCORD_LIMITER keeps the combined request rate under the global limit so workers don't
+    run into 429s.
+    """
+    started = time.monotonic()
+    pending_guilds = iter(guilds)
+
+    async def worker():
+        # Workers share one iterator, so each guild is handled exactly once.
+        for guild in pending_guilds:
+            guild_started = time.monotonic()
+            outcome = await run_delivery_job(guild, composite_id, base_embed, related_ids, target_guild_id, announcement_hash)
+            report.record(outcome, time.monotonic() - guild_started)
+            METRICS.inc('clash_broadcast_guilds_total', {'outcome': outcome}, help_text="Per-guild broadcast outcomes")
+            METRICS.observe('clash_broadcast_guild_seconds', time.monotonic() - guild_started,
+                            help_text="Per-guild broadcast latency")
+
+    workers = min(BROADCAST_WORKERS, len(guilds))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    report.wall_time = time.monotonic() - started
+    METRICS.observe('clash_broadcast_seconds', report.wall_time, help_text="Wall time of a whole broadcast")
+
+    save_state(CLASH_STATE, [str(g.id) for g in guilds])
+    return report
+
+def already_delivered(guild_data, composite_id, announcement_hash):
+    """Whether the guild's announcement already shows this version of the event."""
+    if guild_data.tournament_id != composite_id:
+        return False
+    if guild_data.announcement_hash is None:
+        # Posted before hashes were kept; assume it's current rather than re-editing every guild.
+        guild_data.announcement_hash = announcement_hash
+    return guild_data.announcement_hash == announcement_hash
+
+# --- BROADCAST OUTBOX ---
+# Jobs live on the guild records (outbox_* fields); this is just the set of guilds that have one.
+OUTBOX_GUILDS = set()
+# Guilds with a delivery running right now, so the retry loop and a broadcast never overlap.
+OUTBOX_INFLIGHT = set()
+OUTBOX_TASK = None
+OUTBOX_WAKE = asyncio.Event()
+# Jobs queued before this moment belong to an earlier run that may have posted before dying.
+PROCESS_STARTED_MS = now_ms()
+
+def enqueue_delivery(guild_id, composite_id):
+    record = guild_record(guild_id)
+    OUTBOX_GUILDS.add(str(guild_id))
+    if record.outbox_event_id == composite_id:
+        # Already queued: keep its attempts and age, so the next try still checks for an earlier post.
+        return
+    stamp = int(now_ms())
+    dropped = record.outbox_dropped_id == composite_id
+    record.outbox_event_id = composite_id
+    record.outbox_dropped_id = None
+    record.outbox_attempts = 0
+    record.outbox_next_at = stamp
+    if dropped:
+        # A dropped attempt may have posted; look for it from when that job started.
+        record.outbox_attempts = 1
+    else:
+        record.outbox_created_at = stamp
 
-        current_event_id = guild_data.get('tournament_id')
+def clear_delivery(guild_id, composite_id):
+    """Removes the guild's job if it's still the one for composite_id (a newer event may have replaced it)."""
+    record = CLASH_STATE['guilds'].get(str(guild_id))
+    if record is None or record.outbox_event_id != composite_id:
+        return
+    record.outbox_event_id = None
+    record.outbox_attempts = 0
+    record.outbox_next_at = 0
+    record.outbox_created_at = 0
+    OUTBOX_GUILDS.discard(str(guild_id))
+
+def retry_delivery(guild_id, composite_id):
+    """Reschedules a failed job with exponential backoff, or drops it for good after OUTBOX_MAX_ATTEMPTS."""
+    record = CLASH_STATE['guilds'].get(str(guild_id))
+    if record is None or record.outbox_event_id != composite_id:
+        return
+    record.outbox_attempts += 1
+    if record.outbox_attempts >= OUTBOX_MAX_ATTEMPTS:
+        print(f"Giving up delivering {composite_id} to guild {guild_id} after {record.outbox_attempts} attempts.")
+        METRICS.inc('clash_outbox_dropped_total', help_text="Deliveries dropped after too many attempts")
+        created_at = record.outbox_created_at
+        clear_delivery(guild_id, composite_id)
+        record.outbox_dropped_id = composite_id
+        record.outbox_created_at = created_at
+        return
+    delay = min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * 2 ** (record.outbox_attempts - 1)) * random.uniform(1, 1.25)
+    record.outbox_next_at = int(now_ms() + delay * 1000)
+    OUTBOX_WAKE.set()
+
+def resume_outbox():
+    """Picks up the jobs left in state by an earlier run; the outbox loop delivers them right away."""
+    OUTBOX_GUILDS.clear()
+    OUTBOX_GUILDS.update(gid for gid, record in CLASH_STATE['guilds'].items() if record.outbox_event_id)
+    if OUTBOX_GUILDS:
+        print(f"Resuming {len(OUTBOX_GUILDS)} queued announcement deliveries.")
+    OUTBOX_WAKE.set()
+
+async def run_delivery_job(guild, composite_id, base_embed, related_ids, target_guild_id=None, announcement_hash=None):
+    """Delivers one guild's job; transient failures are retried later instead of being lost."""
+    guild_id = str(guild.id)
+    if guild_id in OUTBOX_INFLIGHT:
+        return 'skipped'
+    record = guild_record(guild_id)
+    # An earlier attempt, in this run or a previous one, may have posted before it failed.
+    verify = record.outbox_attempts > 0 or record.outbox_created_at < PROCESS_STARTED_MS
+
+    OUTBOX_INFLIGHT.add(guild_id)
+    try:
+        outcome = await broadcast_to_guild(guild, composite_id, base_embed, related_ids, target_guild_id,
+                                           announcement_hash, verify)
+    except Exception as e:
+        print(f"Broadcast failed for guild {guild_id}: {e}")
+        retry_delivery(guild_id, composite_id)
+        return 'failed'
+    finally:
+        OUTBOX_INFLIGHT.discard(guild_id)
+    clear_delivery(guild_id, composite_id)
+    return outcome
+
+async def deliver_outbox_event(composite_id, guild_ids):
+    """Delivers due jobs for one event, rebuilding its embed from the stored announcement."""
+    announcement = CLASH_STATE['announcements'].get(composite_id)
+    guilds = []
+    for guild_id in guild_ids:
+        guild = bot.get_guild(int(guild_id))
+        if announcement is None or composite_id not in CLASH_STATE['approved_ids'] or guild is None:
+            # The event expired or the bot left the guild; there's nothing left to deliver.
+            clear_delivery(guild_id, composite_id)
+        else:
+            guilds.append(guild)
+    save_state(CLASH_STATE, guild_ids)
+    if not guilds: return
+
+    print(f"Delivering queued announcement {composite_id} to {len(guilds)} guild(s)...")
+    report = BroadcastReport()
+    await deliver_jobs(guilds, composite_id, discord.Embed.from_dict(announcement['embed']),
+                       announcement['related_ids'], report)
+    print(f"Queued delivery of {composite_id} finished: {report.summary()}")
+
+async def outbox_loop():
+    """Delivers jobs as they come due: resumed ones right after startup, failed ones after their backoff."""
+    await bot.wait_until_ready()
+    while not bot.is_closed():
+        OUTBOX_WAKE.clear()
+        current = now_ms()
+        due, next_at = {}, None
+        for guild_id in list(OUTBOX_GUILDS):
+            record = CLASH_STATE['guilds'].get(guild_id)
+            if record is None or not record.outbox_event_id:
+                OUTBOX_GUILDS.discard(guild_id)
+            elif guild_id in OUTBOX_INFLIGHT:
+                continue
+            elif record.outbox_next_at <= current:
+                due.setdefault(record.outbox_event_id, []).append(guild_id)
+            elif next_at is None or record.outbox_next_at < next_at:
+                next_at = record.outbox_next_at
 
-        if current_event_id == composite_id and not target_guild_id:
-            # Already up to date
+        for composite_id, guild_ids in due.items():
+            try:
+                await deliver_outbox_event(composite_id, guild_ids)
+            except Exception as e:
+                print(f"Outbox delivery of {composite_id} failed: {e}")
+                for guild_id in guild_ids:
+                    retry_delivery(guild_id, composite_id)
+        if due:
             continue
 
-        print(f"Posting/Updating for Guild {guild_id}")
+        timeout = None if next_at is None else max(0, (next_at - current) / 1000)
+        try:
+            await asyncio.wait_for(OUTBOX_WAKE.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+async def find_posted_announcement(channel, base_embed, since_ms):
+    """Looks for this bot's announcement among the channel's latest messages posted since since_ms."""
+    await DISCORD_LIMITER.acquire()
+    async for message in channel.history(limit=OUTBOX_VERIFY_DEPTH):
+        if message.created_at.timestamp() * 1000 < since_ms:
+            break
+        if message.author.id == bot.user.id and message.embeds and message.embeds[0].title == base_embed.title:
+            return message
+    return None
+
+async def broadcast_to_guild(guild, composite_id, base_embed, related_ids, target_guild_id=None, announcement_hash=None,
+                             verify=False):
+    """
+    Posts or updates the announcement in one guild and returns the outcome. A guild already showing
+    this event is only edited when the announcement's content hash changed (e.g. rescheduled days).
+    With verify, a new post first checks the channel for one an earlier attempt already made.
+    """
+    guild_id = str(guild.id)
+    announcement_hash = announcement_hash or content_hash(base_embed.to_dict())
+
+    # Ensure guild entry exists in state
+    guild_data = guild_record(guild_id)
+    channel = resolve_announcement_channel(guild, guild_data)
+
+    if not channel:
+        print(f"No suitable channel found for guild {guild.name} ({guild_id}). Skipping.")
+        return 'skipped'
+
+    current_event_id = guild_data.tournament_id
 
-        old_id_str = current_event_id or ''
-        old_ids = set(old_id_str.split('_')) if old_id_str else set()
-        new_ids = set(related_ids)
-        is_update = not old_ids.isdisjoint(new_ids) and guild_data.get('message_id')
+    if not target_guild_id and already_delivered(guild_data, composite_id, announcement_hash):
+        # Already up to date
+        return 'skipped'
 
-        view = RSVPView(guild_id)
+    print(f"Posting/Updating for Guild {guild_id}")
 
+    old_region, old_ids = split_event_id(current_event_id)
+    new_region, _ = split_event_id(composite_id)
+    new_ids = set(related_ids)
+    is_update = old_region == new_region and not new_ids.isdisjoint(old_ids) and guild_data.message_id
+
+    view = RSVPView(guild_id)
+    # Workers run concurrently, so each guild renders into its own copy.
+    embed = base_embed.copy()
+
+    try:
         if is_update:
             try:
-                guild_data['tournament_id'] = composite_id 
-                msg = await channel.fetch_message(guild_data['message_id'])
-                updated_embed = view.update_embed(base_embed)
+                await DISCORD_LIMITER.acquire()
+                msg = await channel.fetch_message(guild_data.message_id)
+                updated_embed = view.update_embed(embed)
+                await DISCORD_LIMITER.acquire()
                 await msg.edit(embed=updated_embed, view=view)
-                continue
+                guild_data.tournament_id = composite_id
+                guild_data.announcement_hash = announcement_hash
+                # Lock-in times may have moved.
+                schedule_guild_reminders(guild_id)
+                return 'updated'
             except discord.NotFound:
                 print(f"Message not found in guild {guild_id}, posting new.")
 
         # New Post
-        guild_data['saturday'] = {}
-        guild_data['sunday'] = {}
-        guild_data['tournament_id'] = composite_id
-        
-        updated_embed = view.update_embed(base_embed)
-
-        try:
+        guild_data.saturday = {}
+        guild_data.sunday = {}
+        ROSTERS.reset(guild_id)
+        updated_embed = view.update_embed(embed)
+
+        message = None
+        if verify:
+            message = await find_posted_announcement(channel, base_embed, guild_data.outbox_created_at)
+        if message:
+            # Posted by an attempt that failed afterwards: adopt it instead of pinging everyone again.
+            print(f"Found the announcement already posted in guild {guild_id}, adopting it.")
+            await DISCORD_LIMITER.acquire()
+            await message.edit(embed=updated_embed, view=view)
+        else:
+            await DISCORD_LIMITER.acquire()
             message = await channel.send(content=f"{PING_ROLE} New Clash Tournament detected!", embed=updated_embed, view=view)
-            guild_data['message_id'] = message.id
-        except discord.Forbidden:
-            print(f"Missing permissions in guild {guild_id}")
+        guild_data.tournament_id = composite_id
+        guild_data.message_id = message.id
+        guild_data.announcement_hash = announcement_hash
+        guild_data.reminders_sent = 0
+        schedule_guild_reminders(guild_id)
+        return 'posted'
+    except discord.Forbidden:
+        print(f"Missing permissions in guild {guild_id}")
+        return 'forbidden'
+    except discord.NotFound:
+        print(f"Channel not found in guild {guild_id}")
+        return 'not_found'
+
+# --- LOCK-IN REMINDERS ---
+# Min-heap of (due_ms, guild_id, day index, event id, lock_in). Entries are checked against state
+# when they pop, so stale ones (event replaced, rescheduled, reminders turned off) are simply dropped.
+REMINDER_HEAP = []
+REMINDER_TASK = None
+REMINDER_WAKE = asyncio.Event()
+# Batches being sent. Each runs as its own task, so a long DM wave doesn't hold up reminders due meanwhile.
+REMINDER_BATCHES = set()
+REMINDER_DM_LIMITER = RateLimiter(parse_rate_limits(REMINDER_DM_RATE_LIMITS))
+# Sustained DMs per second under the strictest limit, and DMs waiting on the limiter right now.
+REMINDER_DM_RATE = min(count / seconds for count, seconds in parse_rate_limits(REMINDER_DM_RATE_LIMITS))
+REMINDER_DM_QUEUE = {'pending': 0}
+
+def reminder_due(record, day_index, lock_in):
+    """DM waves start early enough that the last signup still hears about it REMINDER_LEAD_MINUTES ahead."""
+    due = lock_in - REMINDER_LEAD_MINUTES * 60 * 1000
+    if record.reminder_mode == 'dm':
+        due -= len(getattr(record, ROSTER_DAYS[day_index][0])) / REMINDER_DM_RATE * 1000
+    return int(due)
+
+def dm_wave_fits(signups, lock_in, current_ms):
+    """Whether a DM wave queued behind the ones already running still finishes before lock-in."""
+    return current_ms + (REMINDER_DM_QUEUE['pending'] + signups) / REMINDER_DM_RATE * 1000 <= lock_in
+
+def reminder_expired(lock_in, current_ms):
+    """Past the last tier's lock-in there's nothing left to remind about."""
+    return current_ms >= lock_in + LOCK_IN_TIER_OFFSETS[-1] * 60 * 1000
+
+def schedule_guild_reminders(guild_id):
+    """Queues the reminders still due for the guild's current event (if it opted in)."""
+    record = CLASH_STATE['guilds'].get(str(guild_id))
+    if record is None or record.reminder_mode not in ('channel', 'dm') or not record.tournament_id:
+        return
+    announcement = CLASH_STATE['announcements'].get(record.tournament_id)
+    if not announcement: return
+    current = now_ms()
+    for day_index, lock_in in enumerate(announcement.get('lock_ins', [])[:len(ROSTER_DAYS)]):
+        if record.reminders_sent >> day_index & 1 or reminder_expired(lock_in, current):
+            continue
+        due = reminder_due(record, day_index, lock_in)
+        if not REMINDER_HEAP or due < REMINDER_HEAP[0][0]:
+            REMINDER_WAKE.set()
+        heapq.heappush(REMINDER_HEAP, (due, str(guild_id), day_index, record.tournament_id, lock_in))
+
+def rebuild_reminders():
+    REMINDER_HEAP.clear()
+    for guild_id in CLASH_STATE['guilds']:
+        schedule_guild_reminders(guild_id)
+    REMINDER_WAKE.set()
+
+def take_due_reminders(current_ms):
+    """Pops every due entry that's still valid and marks it sent (reminders go out at most once)."""
+    batch = []
+    while REMINDER_HEAP and REMINDER_HEAP[0][0] <= current_ms:
+        due, guild_id, day_index, event_id, lock_in = heapq.heappop(REMINDER_HEAP)
+        record = CLASH_STATE['guilds'].get(guild_id)
+        announcement = CLASH_STATE['announcements'].get(event_id)
+        if (record is None or announcement is None or record.tournament_id != event_id
+                or record.reminder_mode not in ('channel', 'dm') or record.reminders_sent >> day_index & 1):
+            continue
+        lock_ins = announcement.get('lock_ins', [])
+        if day_index >= len(lock_ins) or lock_ins[day_index] != lock_in:
+            # Rescheduled since this entry was queued; the fresh entry covers it.
+            continue
+        record.reminders_sent |= 1 << day_index
+        if not reminder_expired(lock_in, current_ms):
+            batch.append((guild_id, day_index, lock_in))
+    if batch:
+        save_state(CLASH_STATE, [guild_id for guild_id, _, _ in batch])
+    return batch
+
+def reminder_text(day_index, lock_in):
+    ts = int(lock_in / 1000)
+    return f"⏰ **{ROSTER_DAYS[day_index][1]} Clash** lock-in opens <t:{ts}:R> (Tier IV at <t:{ts}:t>)!"
+
+async def send_channel_reminder(guild, record, day_index, lock_in):
+    """One message per guild mentioning every signup (split only if it won't fit in one)."""
+    channel = resolve_announcement_channel(guild, record)
+    if not channel: return 0
+    roster = getattr(record, ROSTER_DAYS[day_index][0])
+    header = reminder_text(day_index, lock_in)
+    mentions = [f"<@{user_id}>" for user_id in roster]
+    sent = 0
+    for chunk in chunk_lines(mentions, 2000 - len(header) - 1, " "):
+        await DISCORD_LIMITER.acquire()
+        await channel.send(content=f"{header}\n{chunk}",
+                           allowed_mentions=discord.AllowedMentions(everyone=False, roles=False, users=True))
+        sent += 1
+    return sent
+
+async def send_dm_reminders(record, day_index, lock_in):
+    """DMs each signup, throttled by REMINDER_DM_LIMITER; closed DMs and failed sends are skipped."""
+    roster = getattr(record, ROSTER_DAYS[day_index][0])
+    text = reminder_text(day_index, lock_in) + " Good luck on the Rift."
+    user_ids = list(roster)
+    REMINDER_DM_QUEUE['pending'] += len(user_ids)
+    remaining = len(user_ids)
+    sent = 0
+    try:
+        for user_id in user_ids:
+            await REMINDER_DM_LIMITER.acquire()
+            REMINDER_DM_QUEUE['pending'] -= 1
+            remaining -= 1
+            try:
+                user = bot.get_user(user_id)
+                if user is None:
+                    await DISCORD_LIMITER.acquire()
+                    user = await bot.fetch_user(user_id)
+                await DISCORD_LIMITER.acquire()
+                await user.send(text)
+                sent += 1
+            except (discord.Forbidden, discord.NotFound):
+                pass
+            except discord.HTTPException as e:
+                # One user's failure must not cost the rest of the roster their reminder.
+                print(f"Reminder DM to user {user_id} failed: {e}")
+                METRICS.inc('clash_reminder_dm_failures_total', help_text="Reminder DMs that failed with an HTTP error")
+    finally:
+        REMINDER_DM_QUEUE['pending'] -= remaining
+    return sent
+
+async def send_reminders(batch):
+    """Delivers a batch of due reminders on BROADCAST_WORKERS workers sharing one iterator."""
+    pending = iter(batch)
+    totals = {'channel': 0, 'dm': 0}
+
+    async def worker():
+        for guild_id, day_index, lock_in in pending:
+            record = CLASH_STATE['guilds'][guild_id]
+            guild = bot.get_guild(int(guild_id))
+            if guild is None or not getattr(record, ROSTER_DAYS[day_index][0]): continue
+            mode = record.reminder_mode
+            roster = getattr(record, ROSTER_DAYS[day_index][0])
+            if mode == 'dm' and not dm_wave_fits(len(roster), lock_in, now_ms()):
+                # Too many DMs queued to reach everyone before lock-in: ping them in the channel instead.
+                print(f"DM reminders for guild {guild_id} wouldn't finish before lock-in, using the channel.")
+                mode = 'channel'
+            try:
+                if mode == 'dm':
+                    sent = await send_dm_reminders(record, day_index, lock_in)
+                else:
+                    sent = await send_channel_reminder(guild, record, day_index, lock_in)
+            except Exception as e:
+                print(f"Reminder failed for guild {guild_id}: {e}")
+                continue
+            totals[mode] += sent
+            METRICS.inc('clash_reminders_sent_total', {'mode': mode}, sent,
+                        help_text="Lock-in reminder messages sent")
 
-    save_state(CLASH_STATE)
+    await asyncio.gather(*(worker() for _ in range(min(BROADCAST_WORKERS, len(batch)))))
+    print(f"Sent lock-in reminders for {len(batch)} guild day(s): {totals['channel']} channel message(s), {totals['dm']} DM(s).")
+
+async def reminder_loop():
+    """
+    Sleeps until the earliest reminder is due, then sends everything due by then as one batch.
+    Batches run in the background (sharing REMINDER_DM_LIMITER), so the next due entry starts on time.
+    """
+    await bot.wait_until_ready()
+    while not bot.is_closed():
+        REMINDER_WAKE.clear()
+        batch = take_due_reminders(now_ms())
+        if batch:
+            task = asyncio.ensure_future(send_reminders(batch))
+            REMINDER_BATCHES.add(task)
+            task.add_done_callback(REMINDER_BATCHES.discard)
+            continue
+
+        timeout = max(0, (REMINDER_HEAP[0][0] - now_ms()) / 1000) if REMINDER_HEAP else None
+        try:
+            await asyncio.wait_for(REMINDER_WAKE.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
 
-bot.run(DISCORD_TOKEN)
+if __name__ == "__main__":
+    bot.run(DISCORD_TOKEN)